@@ -0,0 +1,48 @@
+import argparse
+import codecs
+import pickle
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+import requests
+from closer import protocol
+
+def _hexedPickle( backend ):
+    details = dict( popenDetails = dict( args = ( [ 'sleep', '60' ], ), kwargs = {} ),
+                    port = 0,
+                    uuid = str( uuid.uuid4() ),
+                    handshake = True,
+                    controlBackend = backend )
+    return codecs.encode( pickle.dumps( details, protocol = 2 ), 'hex' )
+
+def _rssKilobytes( pid ):
+    with open( '/proc/{}/status'.format( pid ) ) as status:
+        for line in status:
+            if line.startswith( 'VmRSS:' ):
+                return int( line.split()[ 1 ] )
+
+def measure( backend ):
+    command = [ sys.executable, '-m', 'closer.closer3', '--quit-when-told', _hexedPickle( backend ) ]
+    start = time.monotonic()
+    process = subprocess.Popen( command, stderr = subprocess.PIPE )
+    handshake = protocol.parseHandshake( process.stderr.readline() )
+    elapsed = time.monotonic() - start
+    rss = _rssKilobytes( process.pid )
+    requests.get( 'http://localhost:{}/kill'.format( handshake[ 'port' ] ), timeout = 5 )
+    process.wait()
+    return elapsed, rss
+
+def main():
+    parser = argparse.ArgumentParser( description = 'startup time and memory of closer3 control server backends' )
+    parser.add_argument( '--runs', type = int, default = 10 )
+    arguments = parser.parse_args()
+    for backend in [ 'stdlib', 'flask' ]:
+        results = [ measure( backend ) for _ in range( arguments.runs ) ]
+        startup = statistics.median( elapsed for elapsed, rss in results )
+        rss = statistics.median( rss for elapsed, rss in results )
+        print( '{:8} time to handshake: {:7.1f} ms   closer3 RSS: {:7.1f} MB'.format( backend, startup * 1000, rss / 1024 ) )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import argparse
+import statistics
+import subprocess
+import time
+import psutil
+from closer import closer3
+from closer import containment
+
+def _spawnTree( size, containment_ = None ):
+    script = 'for i in $(seq {}); do ( sleep 1000; true ) & done; wait'.format( size )
+    kwargs = {} if containment_ is None else containment_.popenKwargs( {} )
+    process = subprocess.Popen( [ 'bash', '-c', script ], stderr = subprocess.DEVNULL, ** kwargs )
+    if containment_ is not None:
+        containment_.started( process.pid )
+    root = psutil.Process( process.pid )
+    while len( root.children( recursive = True ) ) < 2 * size:
+        time.sleep( 0.01 )
+    return process, root.children( recursive = True )
+
+def _alive( process ):
+    try:
+        return process.status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return False
+
+def _waitForDeath( process, tree ):
+    process.wait()
+    while any( _alive( member ) for member in tree ):
+        time.sleep( 0.001 )
+
+def walk( size ):
+    process, tree = _spawnTree( size )
+    start = time.monotonic()
+    closer3.killTree( process.pid, 'kill' )
+    _waitForDeath( process, tree )
+    return None, time.monotonic() - start
+
+def contained( size ):
+    containment_ = containment.Containment( 'closer-benchmark' )
+    process, tree = _spawnTree( size, containment_ )
+    start = time.monotonic()
+    elapsed = containment_.kill( 'kill', root = process.pid )[ 'elapsed' ]
+    _waitForDeath( process, tree )
+    containment_.close()
+    return elapsed, time.monotonic() - start
+
+def main():
+    parser = argparse.ArgumentParser( description = 'time to kill a process tree: psutil walk versus process group / cgroup' )
+    parser.add_argument( '--size', type = int, default = 500 )
+    parser.add_argument( '--runs', type = int, default = 5 )
+    arguments = parser.parse_args()
+    for name, method in [ ( 'walk', walk ), ( 'contained', contained ) ]:
+        results = [ method( arguments.size ) for _ in range( arguments.runs ) ]
+        dead = statistics.median( dead for atomic, dead in results )
+        line = '{:10} {} processes   all dead in: {:7.1f} ms'.format( name, 2 * arguments.size, dead * 1000 )
+        if results[ 0 ][ 0 ] is not None:
+            line += '   confirmed dead by closer in: {:7.1f} ms'.format( statistics.median( atomic for atomic, dead in results ) * 1000 )
+        print( line )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,33 @@
+import argparse
+import statistics
+import subprocess
+import time
+import closer.remote
+import closer.warm_pool
+
+def measure( user, host, runs ):
+    latencies = []
+    for _ in range( runs ):
+        remote = closer.remote.Remote( user, host, [ 'true' ] )
+        start = time.monotonic()
+        remote.run( stdout = subprocess.DEVNULL, check = True )
+        latencies.append( time.monotonic() - start )
+        time.sleep( 0.5 )
+    return statistics.median( latencies )
+
+def main():
+    parser = argparse.ArgumentParser( description = 'latency of a short remote run(), cold versus handed to a warm closer3 worker' )
+    parser.add_argument( 'user' )
+    parser.add_argument( 'host' )
+    parser.add_argument( '--runs', type = int, default = 10 )
+    arguments = parser.parse_args()
+    closer.remote.Remote( arguments.user, arguments.host ).warmUp()
+    cold = measure( arguments.user, arguments.host, arguments.runs )
+    closer.remote.Remote.warmPool = closer.warm_pool.WarmPool()
+    closer.remote.Remote( arguments.user, arguments.host ).warmUp()
+    time.sleep( 1 )
+    warm = measure( arguments.user, arguments.host, arguments.runs )
+    print( 'cold run: {:7.1f} ms   warm run: {:7.1f} ms'.format( cold * 1000, warm * 1000 ) )
+
+if __name__ == '__main__':
+    main()
@@ -3,9 +3,7 @@ from setuptools import setup, find_packages
 README = 'monitor and close remote SSH processes automatically'
 
 requires = [ 'psutil',
-             'flask',
-             'requests',
-             'pimped_subprocess>=2.2.0', ]
+             'requests', ]
 tests_require = [
         'pytest',
         ]
@@ -28,6 +26,7 @@ setup(name='closer',
       zip_safe=False,
       extras_require={
           'testing': tests_require,
+          'flask': [ 'flask' ],
       },
       install_requires=requires,
       entry_points={
@@ -0,0 +1,85 @@
+import json
+import subprocess
+from closer import launch
+from closer import remote
+
+READY_TIMEOUT = 30
+
+class Agent( remote.Remote ):
+    def __init__( self, user, host ):
+        remote.Remote.__init__( self, user, host )
+        self._token = None
+
+    def __repr__( self ):
+        return 'closer agent on {}'.format( self._sshTarget )
+
+    def start( self, cleanup = False ):
+        kwargs = dict( self._ownKwargs )
+        kwargs.pop( 'stderr', None )
+        channel_ = self._openChannel( kwargs )
+        sshCommand = self._commandLine( [ '--agent' ], True )
+        self._armDeadManSwitch( cleanup )
+        self._process = self._popen( sshCommand, True, subprocess.PIPE, kwargs )
+        self._startHeartbeat( self._process.stdin.fileno() )
+        channel_.start( remote.Remote.reactor )
+        if cleanup:
+            remote.Remote._cleanup.append( self )
+        return self._launch
+
+    def _handshake( self, handshake ):
+        self._token = handshake[ 'token' ]
+        remote.Remote._handshake( self, handshake )
+
+    def _request( self, method, path, timeout = None, ** kwargs ):
+        self._launch.wait( READY_TIMEOUT )
+        return remote.Remote.controlClient.request( method, self._host, self._port, path, timeout = timeout, token = self._token, ** kwargs )
+
+    def launchJob( self, remote_ ):
+        launch_ = launch.Launch( remote_ )
+        spec = dict( uuid = remote_.uuid, killer = remote_.killer, grace = remote_.gracePeriod, timeout = remote_._timeout, args = remote_._remotePopenDetails[ 'args' ], kwargs = remote_._remotePopenDetails[ 'kwargs' ] )
+        started = self._request( 'POST', '/launch', data = json.dumps( spec ) )
+        launch_._handshake( json.loads( started ) )
+        return launch_
+
+    def killJob( self, uuid, timeout = None ):
+        if self._terminated:
+            return None
+        return self._request( 'GET', '/kill', timeout = timeout, params = dict( uuid = uuid ) )
+
+    def signalJob( self, uuid, signalNumber, timeout = None ):
+        return self._request( 'GET', '/signal', timeout = timeout, params = dict( uuid = uuid, number = signalNumber ) )
+
+    def status( self, timeout = None, uuid = None ):
+        params = {} if uuid is None else dict( uuid = uuid )
+        return json.loads( self._request( 'GET', '/status', timeout = timeout, params = params ) )
+
+    def signal( self, signalNumber, timeout = None ):
+        self._unsupported( 'signal', 'signalJob() or terminate()' )
+
+    def background( self, cleanup = False, timeout = None ):
+        self._unsupported( 'background', 'start()' )
+
+    def run( self, binary = False, timeout = None, check = False, ** kwargsForRun ):
+        self._unsupported( 'run', 'a Remote with useAgent()' )
+
+    def foreground( self, check = True, binary = False, timeout = None ):
+        self._unsupported( 'foreground', 'a Remote with useAgent()' )
+
+    def output( self, binary = False, check = True, timeout = None ):
+        self._unsupported( 'output', 'a Remote with useAgent()' )
+
+    def liveMonitor( self, onOutput, onProcessEnd = None, cleanup = False, timeout = None ):
+        self._unsupported( 'liveMonitor', 'a Remote with useAgent()' )
+
+    def detach( self, timeout = None ):
+        self._unsupported( 'detach', 'a Remote' )
+
+    def reattach( self, onOutput, onProcessEnd = None, offset = 0, discard = False ):
+        self._unsupported( 'reattach', 'a Remote' )
+
+    def useAgent( self, agent ):
+        self._unsupported( 'useAgent', 'a Remote' )
+
+    def _kill( self, timeout ):
+        self._request( 'GET', '/shutdown', timeout = self._killTimeout( timeout ) )
+        self._terminated = True
@@ -0,0 +1,158 @@
+import binascii
+import collections
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from closer import closer3
+from closer import containment
+from closer import control_server
+from closer import fan_out
+
+REAP_INTERVAL = 1
+KILL_WORKERS = 64
+FINISHED_RETENTION = 1000
+
+class _Job( object ):
+    def __init__( self, process, killer, grace, containment_ ):
+        self.process = process
+        self.killer = killer
+        self.grace = containment.GRACE if grace is None else grace
+        self.containment = containment_
+        self.timedOut = False
+        self._lock = threading.Lock()
+
+    def watchDeadline( self, timeout ):
+        if timeout is not None:
+            closer3.watchDeadline( timeout, self._onDeadline )
+
+    def _onDeadline( self ):
+        self.kill( deadline = True )
+
+    def kill( self, deadline = False ):
+        with self._lock:
+            if self.process.poll() is not None:
+                return dict( elapsed = 0, survivors = [] )
+            if deadline:
+                self.timedOut = True
+            return self.containment.kill( self.killer, root = self.process.pid, grace = self.grace )
+
+    def signal( self, signalNumber ):
+        with self._lock:
+            if self.process.poll() is not None:
+                return
+            self.containment.signal( signalNumber )
+
+    def _poll( self ):
+        if self._lock.acquire( blocking = False ):
+            try:
+                self.process.poll()
+            finally:
+                self._lock.release()
+        return self.process.returncode
+
+    def finished( self ):
+        return self._poll() is not None
+
+    def status( self ):
+        return dict( pid = self.process.pid, returncode = self._poll(), timedOut = self.timedOut )
+
+class AgentDaemon( object ):
+    def __init__( self, uuid ):
+        self._uuid = uuid
+        self._jobs = {}
+        self._finished = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self._server = None
+
+    def run( self, port, deadManWindow = None ):
+        listener = closer3._bindControlSocket( port )
+        token = binascii.hexlify( os.urandom( 16 ) ).decode()
+        self._server = control_server.ControlServer( listener, self._routes(), token = token )
+        signal.signal( signal.SIGTERM, self._onSIGTERM )
+        reaper = threading.Thread( target = self._reap )
+        reaper.daemon = True
+        reaper.start()
+        if deadManWindow:
+            closer3.watchController( deadManWindow, self._shutdown )
+        closer3.announce( uuid = self._uuid, port = listener.getsockname()[ 1 ], pid = os.getpid(), token = token )
+        self._server.serve_forever()
+
+    def _routes( self ):
+        return { '/ping': lambda: self._uuid,
+                 '/launch': self._launch,
+                 '/kill': self._kill,
+                 '/signal': self._signal,
+                 '/status': self._status,
+                 '/shutdown': self._shutdown }
+
+    def _launch( self, body ):
+        spec = json.loads( body.decode() )
+        kwargs = dict( spec[ 'kwargs' ] )
+        for stream in [ 'stdin', 'stdout', 'stderr' ]:
+            kwargs.setdefault( stream, subprocess.DEVNULL )
+        containment_ = containment.Containment()
+        process = subprocess.Popen( * spec[ 'args' ], ** containment_.popenKwargs( kwargs ) )
+        containment_.started( process.pid )
+        job = _Job( process, spec.get( 'killer', 'terminate' ), spec.get( 'grace' ), containment_ )
+        with self._lock:
+            self._jobs[ spec[ 'uuid' ] ] = job
+        job.watchDeadline( spec.get( 'timeout' ) )
+        return json.dumps( dict( uuid = spec[ 'uuid' ], pid = process.pid ) )
+
+    def _job( self, uuid ):
+        with self._lock:
+            return self._jobs.get( uuid ) or self._finished.get( uuid )
+
+    def _kill( self, uuid ):
+        job = self._job( uuid )
+        if job is None:
+            return 'unknown'
+        return json.dumps( job.kill() )
+
+    def _signal( self, uuid, number ):
+        job = self._job( uuid )
+        if job is None:
+            return 'unknown'
+        job.signal( int( number ) )
+        return 'ok'
+
+    def _status( self, uuid = None ):
+        with self._lock:
+            jobs = dict( self._finished )
+            jobs.update( self._jobs )
+        if uuid is not None:
+            jobs = { uuid: jobs[ uuid ] } if uuid in jobs else {}
+        return json.dumps( { uuid_: job.status() for uuid_, job in jobs.items() } )
+
+    def _killAll( self ):
+        with self._lock:
+            jobs = list( self._jobs.values() )
+        fan_out.FanOut( lambda job: job.kill(), jobs ).run( KILL_WORKERS )
+
+    def _shutdown( self ):
+        self._killAll()
+        self._server.stop()
+        return 'bye'
+
+    def _onSIGTERM( self, * args ):
+        self._killAll()
+        sys.exit( 0 )
+
+    def _reap( self ):
+        while True:
+            time.sleep( REAP_INTERVAL )
+            with self._lock:
+                jobs = list( self._jobs.items() )
+            finished = [ ( uuid, job ) for uuid, job in jobs if job.finished() ]
+            with self._lock:
+                for uuid, job in finished:
+                    del self._jobs[ uuid ]
+                    self._finished[ uuid ] = job
+                while len( self._finished ) > FINISHED_RETENTION:
+                    self._finished.popitem( last = False )
+            for uuid, job in finished:
+                job.containment.close()
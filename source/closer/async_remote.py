@@ -0,0 +1,270 @@
+import asyncio
+import atexit
+import json
+import logging
+import os
+import subprocess
+import threading
+import requests
+from closer import channel
+from closer import containment
+from closer import exceptions
+from closer import heartbeat
+from closer import launch
+from closer import protocol
+from closer import remote
+from closer import stream_control
+
+TERMINATE_TIMEOUT = 10
+
+class AsyncRemote( remote.Remote ):
+    _cleanup = []
+
+    @classmethod
+    async def atidyUp( cls ):
+        await asyncio.gather( * [ remote_.terminate() for remote_ in cls._cleanup ] )
+
+    @classmethod
+    def _tidyUpAtExit( cls ):
+        return remote.Remote._killInParallel( cls._cleanup, remote.TIDY_UP_WORKERS, None, remote.TIDY_UP_DEADLINE )
+
+    def __init__( self, user, host, * popenArgs, ** popenKwargs ):
+        remote.Remote.__init__( self, user, host, * popenArgs, ** popenKwargs )
+        self._stderrTask = None
+        self._heartbeatTask = None
+        self._launchCommand = None
+        self._loop = None
+        self._loopThread = None
+
+    async def _spawn( self, stdin, kwargs ):
+        self._refuseAgent( 'AsyncRemote' )
+        self._launch = launch.Launch( self )
+        stderr = kwargs.pop( 'stderr', None )
+        if stderr == subprocess.STDOUT:
+            self._launch._unavailable( 'its stderr is merged into stdout, so closer sends no handshake' )
+            await self._exec( False, stdin, dict( kwargs, stderr = stderr ) )
+            return None
+        forward, captured = channel.sink( stderr )
+        await self._exec( True, stdin, dict( kwargs, stderr = subprocess.PIPE ) )
+        self._stderrTask = asyncio.ensure_future( self._readStderr( forward ) )
+        return captured
+
+    async def _exec( self, handshake, stdin, kwargs ):
+        self._launchCommand = self._quitWhenToldCommand( handshake, stdin )
+        if not self._sendsDetailsOnStdin( stdin ):
+            self._process = await asyncio.create_subprocess_exec( * self._launchCommand, stdin = stdin, ** kwargs )
+            return
+        frame = self._detailsFrame( handshake )
+        if stdin == subprocess.PIPE:
+            self._process = await asyncio.create_subprocess_exec( * self._launchCommand, stdin = subprocess.PIPE, ** kwargs )
+            self._process.stdin.write( frame )
+            try:
+                await self._process.stdin.drain()
+            except ConnectionResetError:
+                pass
+            return
+        reader, writer = os.pipe()
+        try:
+            self._process = await asyncio.create_subprocess_exec( * self._launchCommand, stdin = reader, ** kwargs )
+        except Exception:
+            os.close( writer )
+            raise
+        finally:
+            os.close( reader )
+        channel.feed( writer, frame, stdin )
+
+    async def _readStderr( self, forward ):
+        stream = self._process.stderr
+        while True:
+            line = await stream.readline()
+            if not line:
+                self._noHandshake()
+                return
+            handshake = protocol.parseHandshake( line )
+            if handshake is None:
+                forward( line )
+                continue
+            self._handshake( handshake )
+            break
+        if handshake.get( 'framed' ):
+            await self._readFrames( stream, forward )
+            return
+        while True:
+            data = await stream.read( channel.CHUNK )
+            if not data:
+                return
+            forward( data )
+
+    async def _readFrames( self, stream, forward ):
+        decoder = protocol.FrameDecoder()
+        try:
+            while True:
+                data = await stream.read( channel.CHUNK )
+                if not data:
+                    return
+                for kind, payload in decoder.feed( data ):
+                    if kind == protocol.STDERR:
+                        forward( payload )
+                    elif kind == protocol.REPLY:
+                        self._onControlReply( payload )
+                    elif kind == protocol.OUTCOME:
+                        self._onOutcome( json.loads( payload.decode() ) )
+        finally:
+            self._controlStreamClosed()
+
+    async def ready( self, timeout = None ):
+        return await asyncio.wait_for( asyncio.wrap_future( self._launch.ready ), timeout )
+
+    def _shareTransport( self ):
+        self._loop = asyncio.get_event_loop()
+        self._loopThread = threading.get_ident()
+        if self._deadManWindow:
+            self._heartbeatTask = asyncio.ensure_future( self._heartbeat( self._deadManWindow / remote.HEARTBEATS_PER_WINDOW ) )
+        if self._controlStream:
+            self._streamControl = stream_control.StreamControlClient( self._writeStdin )
+
+    async def _heartbeat( self, interval ):
+        transport = self._process.stdin.transport
+        while self._process.returncode is None and not transport.is_closing():
+            if not transport.get_write_buffer_size():
+                transport.write( heartbeat.BEAT )
+            await asyncio.sleep( interval )
+
+    def _writeStdin( self, data ):
+        if threading.get_ident() != self._loopThread:
+            if self._loop.is_closed():
+                raise BrokenPipeError( 'the event loop of {} is closed'.format( self ) )
+            self._loop.call_soon_threadsafe( self._writeStdin, data )
+            return
+        transport = self._process.stdin.transport
+        if transport.is_closing():
+            raise BrokenPipeError( 'stdin of {} is closed'.format( self ) )
+        transport.write( data )
+
+    async def background( self, cleanup = False, timeout = None ):
+        self._armDeadManSwitch( cleanup )
+        self._setDeadline( timeout )
+        self._useControlStream( self._ownKwargs.get( 'stderr' ) != subprocess.STDOUT )
+        await self._spawn( subprocess.PIPE, dict( self._ownKwargs ) )
+        self._shareTransport()
+        if cleanup:
+            AsyncRemote._cleanup.append( self )
+        return self._launch
+
+    async def foreground( self, check = True, binary = False, timeout = None ):
+        completedProcess = await self.run( binary = binary, timeout = timeout, check = check )
+        return completedProcess.returncode
+
+    async def output( self, binary = False, check = True, timeout = None ):
+        process = await self.run( binary = binary, check = check, timeout = timeout, stdout = subprocess.PIPE )
+        return process.stdout
+
+    async def run( self, binary = False, timeout = None, check = False, ** kwargsForRun ):
+        kwargs = dict( self._ownKwargs )
+        kwargs.update( kwargsForRun )
+        self._deadManWindow = None
+        self._controlStream = False
+        self._setDeadline( None if kwargs.get( 'stderr' ) == subprocess.STDOUT else timeout )
+        captured = await self._spawn( kwargs.pop( 'stdin', None ), kwargs )
+        try:
+            output, returncode = await asyncio.wait_for( self._collect(), None if timeout is None else self._localTimeout( timeout ) )
+        except asyncio.TimeoutError:
+            if await self.terminate() is None:
+                try:
+                    self._process.kill()
+                except ProcessLookupError:
+                    pass
+                await self._process.wait()
+            self._raiseTimeout( timeout )
+        if self.timedOut:
+            self._terminated = True
+            self._raiseTimeout( timeout )
+
+        error = None if captured is None else captured.getvalue()
+        if not binary:
+            output = None if output is None else channel.decode( output )
+            error = None if error is None else channel.decode( error )
+        self._process = subprocess.CompletedProcess( self._launchCommand, returncode, stdout = output, stderr = error )
+        if check and returncode != 0:
+            calledProcessError = subprocess.CalledProcessError( returncode, self._launchCommand, output = output, stderr = error )
+            raise exceptions.RemoteProcessError( self._remotePopenDetails, calledProcessError )
+        return self._process
+
+    async def _collect( self ):
+        output = None
+        if self._process.stdout is not None:
+            output = await self._process.stdout.read()
+        returncode = await self._process.wait()
+        if self._stderrTask is not None:
+            await self._stderrTask
+        return output, returncode
+
+    async def lines( self, cleanup = False, timeout = None ):
+        kwargs = dict( self._ownKwargs )
+        kwargs[ 'stdout' ] = subprocess.PIPE
+        self._armDeadManSwitch( cleanup )
+        self._setDeadline( timeout )
+        self._useControlStream( kwargs.get( 'stderr' ) != subprocess.STDOUT )
+        await self._spawn( subprocess.PIPE, kwargs )
+        self._shareTransport()
+        if cleanup:
+            AsyncRemote._cleanup.append( self )
+        async for line in self._process.stdout:
+            yield line.decode( errors = 'replace' ).rstrip( '\r\n' )
+        await self._process.wait()
+
+    @property
+    def returncode( self ):
+        return self._process.returncode
+
+    async def terminate( self, timeout = None ):
+        if timeout is None:
+            timeout = TERMINATE_TIMEOUT + ( containment.GRACE if self._grace is None else self._grace ) + containment.CONFIRM_TIMEOUT
+        try:
+            logging.info( 'terminating {}'.format( self ) )
+            if self._terminated:
+                return self._killReport
+            response = await asyncio.wait_for( self._request( '/kill' ), timeout )
+            self._killReport = remote.KillReport.parse( response.decode( errors = 'replace' ) )
+            self._terminated = True
+            return self._killReport
+        except ( OSError, asyncio.TimeoutError ) as e:
+            logging.error( 'exception {!r} happened while killing {}. This may not be a problem if the process already died on the remote side'.format( e, self ) )
+            return None
+
+    def _kill( self, timeout ):
+        if self._controlBackend == 'ssh' or self._port is None:
+            raise requests.exceptions.ConnectionError( 'cannot reach {} without its event loop, leaving it to the dead-man switch'.format( self ) )
+        response = remote.Remote.controlClient.get( self._host, self._port, '/kill', timeout = self._killTimeout( timeout ) )
+        self._killReport = remote.KillReport.parse( response )
+        self._terminated = True
+        return self._killReport
+
+    async def _request( self, path ):
+        if self._controlBackend != 'ssh':
+            return await self._get( path )
+        if self._streamControl is None:
+            raise OSError( 'no ssh control stream to {}, it only exists for background() and lines()'.format( self ) )
+        body = await asyncio.wrap_future( self._streamControl.send( path ) )
+        return body.encode()
+
+    async def _get( self, path ):
+        if self._port is None:
+            try:
+                await self.ready( remote.READY_TIMEOUT )
+            except exceptions.RemoteProcessException as e:
+                raise OSError( 'remote closer never reported its control port: {!r}'.format( e ) )
+        reader, writer = await asyncio.open_connection( self._host, self._port )
+        try:
+            request = 'GET {} HTTP/1.1\r\nHost: {}:{}\r\nConnection: close\r\n\r\n'.format( path, self._host, self._port )
+            writer.write( request.encode( 'latin-1' ) )
+            response = await reader.read()
+        finally:
+            writer.close()
+        head, _, body = response.partition( b'\r\n\r\n' )
+        status = head.split( b' ', 2 )[ 1 : 2 ]
+        if status != [ b'200' ]:
+            raise OSError( 'closer control request {} failed: {!r}'.format( path, head[ : 100 ] ) )
+        return body
+
+atexit.register( AsyncRemote._tidyUpAtExit )
@@ -0,0 +1,134 @@
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+from closer import protocol
+
+CHUNK = 65536
+
+def _writeAll( fd, data ):
+    while data:
+        written = os.write( fd, data )
+        data = data[ written : ]
+
+def _writeToStandardError( data ):
+    stream = getattr( sys.stderr, 'buffer', None )
+    if stream is None:
+        sys.stderr.write( data.decode( errors = 'replace' ) )
+    else:
+        stream.write( data )
+    sys.stderr.flush()
+
+def sink( stderr ):
+    if stderr is None:
+        return _writeToStandardError, None
+    if stderr == subprocess.PIPE:
+        captured = io.BytesIO()
+        return captured.write, captured
+    if stderr == subprocess.DEVNULL:
+        return lambda data: None, None
+    fd = stderr if isinstance( stderr, int ) else stderr.fileno()
+    return lambda data: _writeAll( fd, data ), None
+
+def _copy( source, fd ):
+    try:
+        while True:
+            data = os.read( source, CHUNK )
+            if not data:
+                return
+            _writeAll( fd, data )
+    except OSError:
+        pass
+    finally:
+        os.close( fd )
+
+def feed( fd, head, stdin ):
+    try:
+        _writeAll( fd, head )
+    except OSError:
+        os.close( fd )
+        return
+    if stdin is None or stdin == subprocess.DEVNULL:
+        os.close( fd )
+        return
+    source = stdin if isinstance( stdin, int ) else stdin.fileno()
+    thread = threading.Thread( target = _copy, args = ( source, fd ) )
+    thread.daemon = True
+    thread.start()
+
+def decode( data ):
+    return io.TextIOWrapper( io.BytesIO( data ) ).read()
+
+class Channel( object ):
+    def __init__( self, remote, stderr = None ):
+        self._remote = remote
+        self._forward, self._captured = sink( stderr )
+        self._reader, self._writer = os.pipe()
+        self._handshakeDone = False
+        self._buffer = b''
+        self._frames = None
+        self._finished = threading.Event()
+
+    @property
+    def stderr( self ):
+        return self._writer
+
+    def redirect( self, stderr ):
+        self._forward, self._captured = sink( stderr )
+
+    def start( self, reactor ):
+        os.close( self._writer )
+        reactor.addStream( self._reader, self._onData, self._onEOF )
+
+    def join( self, timeout = None ):
+        self._finished.wait( timeout )
+
+    def captured( self, binary ):
+        if self._captured is None:
+            return None
+        data = self._captured.getvalue()
+        if binary:
+            return data
+        return decode( data )
+
+    def _onData( self, data ):
+        if self._frames is not None:
+            self._onFrames( data )
+            return
+        if self._handshakeDone:
+            self._forward( data )
+            return
+        self._buffer += data
+        while not self._handshakeDone and b'\n' in self._buffer:
+            line, _, self._buffer = self._buffer.partition( b'\n' )
+            line += b'\n'
+            handshake = protocol.parseHandshake( line )
+            if handshake is None:
+                self._forward( line )
+                continue
+            self._handshakeDone = True
+            if handshake.get( 'framed' ):
+                self._frames = protocol.FrameDecoder()
+            self._remote._handshake( handshake )
+        if self._handshakeDone and self._buffer:
+            data, self._buffer = self._buffer, b''
+            self._onData( data )
+
+    def _onFrames( self, data ):
+        for kind, payload in self._frames.feed( data ):
+            if kind == protocol.STDERR:
+                self._forward( payload )
+            elif kind == protocol.REPLY:
+                self._remote._onControlReply( payload )
+            elif kind == protocol.OUTCOME:
+                self._remote._onOutcome( json.loads( payload.decode() ) )
+
+    def _onEOF( self ):
+        if not self._handshakeDone:
+            if self._buffer:
+                self._forward( self._buffer )
+            self._remote._noHandshake()
+        self._remote._controlStreamClosed()
+        self._finished.set()
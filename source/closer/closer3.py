@@ -1,96 +1,427 @@
 import subprocess
-import codecs
 import threading
 import signal
-import argparse
-import psutil
 import os
-import pickle
 import sys
-import pprint
-import flask
-import logging
+import socket
+import json
+import time
+from closer import protocol
+from closer import containment as containment_
+from closer import registry
 killer = None
+grace = containment_.GRACE
 killedByUser = False
+deadlineExpired = False
+containment = None
+child = None
+KILL_JOBS_TIMEOUT = containment_.GRACE + containment_.CONFIRM_TIMEOUT + 1
+
+def killTree( pid, killer, includeRoot = True ):
+    import psutil
+    try:
+        root = psutil.Process( pid )
+        processes = root.children( recursive = True )
+    except psutil.NoSuchProcess:
+        return
+    if includeRoot:
+        processes.append( root )
+    for process in processes:
+        try:
+            killMethod = getattr( process, killer )
+            killMethod()
+        except psutil.NoSuchProcess:
+            pass
 
 def killAll( * args ):
     global killer
-    me = psutil.Process( os.getpid() )
-    for process in me.children( recursive = True ):
-        killMethod = getattr( process, killer )
-        killMethod()
-
-def spreadAround( middle, delta ):
-    yield middle
-    for i in range( 1, delta + 1 ):
-        yield middle + i
-        yield middle - i
-
-def _launchWebApp( webApp, host, port ):
-    for port_ in spreadAround( port, 10 ):
+    if containment is None:
+        killTree( os.getpid(), killer, includeRoot = False )
+        return None
+    return containment.kill( killer, root = os.getpid(), grace = grace )
+
+def _controlSocket():
+    if socket.has_ipv6:
         try:
-            return webApp.run( host = '0.0.0.0', port = port_ )
-        except OSError as e:
-            PORT_TAKEN = 98
-            if e.errno != PORT_TAKEN:
-                raise
+            listener = socket.socket( socket.AF_INET6, socket.SOCK_STREAM )
+        except OSError:
+            listener = None
+        if listener is not None:
+            try:
+                listener.setsockopt( socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 0 )
+                return listener, '::'
+            except OSError:
+                listener.close()
+    return socket.socket( socket.AF_INET, socket.SOCK_STREAM ), '0.0.0.0'
+
+def _bindControlSocket( port ):
+    listener, host = _controlSocket()
+    listener.setsockopt( socket.SOL_SOCKET, socket.SO_REUSEADDR, 1 )
+    try:
+        listener.bind( ( host, port ) )
+        listener.listen( 128 )
+    except OSError:
+        listener.close()
+        raise
+    return listener
+
+def _onKill( stopServer ):
+    global killedByUser
+    killedByUser = True
+    report = killAll()
+    stopServer()
+    return json.dumps( report )
+
+def _onSignal( number ):
+    containment.signal( int( number ) )
+    return 'ok'
+
+def _status():
+    return json.dumps( dict( pid = child.pid, returncode = child.returncode ) )
+
+def _routes( uuid, stopServer ):
+    return { '/kill': lambda: _onKill( stopServer ),
+             '/ping': lambda: uuid,
+             '/signal': _onSignal,
+             '/status': _status }
+
+def _stdlibServer( listener, uuid ):
+    from closer import control_server
+    server = control_server.ControlServer( listener, {} )
+    server.routes.update( _routes( uuid, server.stop ) )
+    return server
+
+def _framedStandardError():
+    from closer import stream_control
+    return stream_control.FramedStandardError()
+
+def _streamServer( uuid ):
+    from closer import stream_control
+    server = stream_control.StreamControlServer( {} )
+    server.routes.update( _routes( uuid, server.stop ) )
+    return server
 
-def quitWhenToldServer( port, uuid ):
+def _flaskServer( listener, uuid ):
+    import logging
+    import flask
+    import werkzeug.serving
     webApp = flask.Flask( 'closer' )
 
+    def stopServer():
+        shutdown = threading.Thread( target = server.shutdown )
+        shutdown.daemon = True
+        shutdown.start()
+
     @webApp.route("/kill")
     def kill():
-        global killedByUser
-        killedByUser = True
-        killAll()
-        shutdownFlask = flask.request.environ.get('werkzeug.server.shutdown')
-        shutdownFlask()
-        return 'bye'
+        return _onKill( stopServer )
 
     @webApp.route("/ping")
     def ping():
         return uuid
 
+    @webApp.route("/signal")
+    def signal_():
+        return _onSignal( flask.request.args[ 'number' ] )
+
+    @webApp.route("/status")
+    def status():
+        return _status()
+
     IMPOSSIBLE_LEVEL = 500
     log = logging.getLogger('werkzeug')
     log.setLevel( IMPOSSIBLE_LEVEL )
     webApp.logger.setLevel( IMPOSSIBLE_LEVEL )
-    _launchWebApp( webApp, '0.0.0.0', port )
+    host, port = listener.getsockname()[ : 2 ]
+    try:
+        server = werkzeug.serving.make_server( host, port, webApp, fd = listener.fileno() )
+    finally:
+        listener.close()
+    server.stop = stopServer
+    return server
+
+CONTROL_BACKENDS = { 'stdlib': _stdlibServer, 'flask': _flaskServer }
+
+def quitWhenToldServer( port, uuid, backend = 'stdlib' ):
+    if backend == 'ssh':
+        return _streamServer( uuid )
+    listener = _bindControlSocket( port )
+    return CONTROL_BACKENDS[ backend ]( listener, uuid )
+
+def watchController( window, onLost, handlers = None, onEOF = None ):
+    handlers = handlers or {}
+    lastBeat = [ time.monotonic() ]
+    disconnected = threading.Event()
+
+    def read():
+        while True:
+            try:
+                frame = protocol.readFrame( sys.stdin.fileno() )
+            except ( OSError, EOFError ):
+                frame = None
+            if frame is None:
+                break
+            lastBeat[ 0 ] = time.monotonic()
+            handler = handlers.get( frame[ 0 ] )
+            if handler is not None:
+                handler( frame[ 1 ] )
+        disconnected.set()
+        if onEOF is not None:
+            onEOF()
+
+    def watch():
+        while not disconnected.wait( window / 10 ):
+            if time.monotonic() - lastBeat[ 0 ] > window:
+                break
+        onLost()
+
+    targets = [ read ]
+    if window:
+        signal.signal( signal.SIGHUP, lambda * args: disconnected.set() )
+        targets.append( watch )
+    for target in targets:
+        thread = threading.Thread( target = target )
+        thread.daemon = True
+        thread.start()
 
-def interpret( hexedPickle ):
+def watchDeadline( timeout, onExpired ):
+    timer = threading.Timer( timeout, onExpired )
+    timer.daemon = True
+    timer.start()
+    return timer
+
+def _running( subProcess ):
+    try:
+        return os.waitid( os.P_PID, subProcess.pid, os.WEXITED | os.WNOHANG | os.WNOWAIT ) is None
+    except ChildProcessError:
+        return False
+
+def _onDeadline( subProcess ):
+    global deadlineExpired
+    if not _running( subProcess ):
+        return
+    deadlineExpired = True
+    killAll()
+
+def announce( ** fields ):
+    stream = getattr( sys.stderr, 'buffer', sys.stderr )
+    try:
+        stream.write( protocol.handshakeLine( ** fields ) )
+        stream.flush()
+    except OSError:
+        pass
+
+def interpret( hexedPickle = None ):
+    import pickle
+    if hexedPickle is None:
+        frame = protocol.readFrame( sys.stdin.fileno() )
+        if frame is None:
+            return None
+        if frame[ 0 ] != protocol.DETAILS:
+            raise EOFError( 'expected launch details on stdin' )
+        return pickle.loads( frame[ 1 ] )
+    import codecs
     pickled = codecs.decode( hexedPickle, 'hex' )
     return pickle.loads( pickled )
 
+def _waitForChild( subProcess, subreaper ):
+    if not subreaper:
+        return subProcess.wait()
+    return containment_.reapUntil( subProcess )
+
+def _killLeftovers():
+    if containment.occupied( os.getpid() ):
+        killAll()
+    containment_.reapAll()
+
+def _jobs( arguments ):
+    entries = registry.jobs( arguments.tag, arguments.uuids )
+    if not arguments.killJobs:
+        print( json.dumps( entries ) )
+        return
+    if arguments.tag is None and not arguments.uuids:
+        sys.exit( 'closer3: --kill-jobs needs --tag or --uuid' )
+    print( json.dumps( registry.kill( entries, KILL_JOBS_TIMEOUT ) ) )
+
+def _detach( details ):
+    global containment
+    global child
+    from closer import spool
+    uuid = details[ 'uuid' ]
+    output = spool.create( uuid )
+    reader, writer = os.pipe()
+    if os.fork():
+        os.close( writer )
+        os.close( output )
+        with os.fdopen( reader, 'rb' ) as started:
+            report = json.loads( started.read().decode() or '{}' )
+        if 'pid' not in report:
+            sys.exit( 'closer3 could not start detached job {}: {}'.format( uuid, report.get( 'error', 'supervisor died' ) ) )
+        announce( uuid = uuid, port = None, pid = report[ 'pid' ], spool = spool.directory( uuid ) )
+        return
+    os.close( reader )
+    os.setsid()
+    devnull = os.open( os.devnull, os.O_RDWR )
+    os.dup2( devnull, 0 )
+    os.dup2( output, 1 )
+    os.dup2( output, 2 )
+    os.close( devnull )
+    os.close( output )
+    popenDetails = details[ 'popenDetails' ]
+    popenKwargs = dict( popenDetails[ 'kwargs' ], stdin = subprocess.DEVNULL, stdout = None, stderr = None )
+    containment = containment_.Containment( 'closer-{}'.format( uuid ) )
+    subreaper = containment_.becomeSubreaper()
+    try:
+        subProcess = subprocess.Popen( * popenDetails[ 'args' ], ** containment.popenKwargs( popenKwargs ) )
+    except OSError as e:
+        os.write( writer, json.dumps( dict( error = str( e ) ) ).encode() )
+        spool.discard( uuid )
+        sys.exit( 1 )
+    child = subProcess
+    containment.started( subProcess.pid )
+    signal.signal( signal.SIGTERM, killAll )
+    registry.register( uuid, details.get( 'tag' ), subProcess.pid )
+    if details.get( 'timeout' ) is not None:
+        deadline = watchDeadline( details[ 'timeout' ], lambda: _onDeadline( subProcess ) )
+    os.write( writer, json.dumps( dict( pid = subProcess.pid ) ).encode() )
+    os.close( writer )
+    exitCode = _waitForChild( subProcess, subreaper )
+    if deadlineExpired:
+        deadline.join()
+    _killLeftovers()
+    spool.finish( uuid, exitCode )
+    registry.unregister( uuid )
+    containment.close()
+    sys.exit( exitCode )
+
+def _reattach( details ):
+    from closer import spool
+    uuid = details[ 'uuid' ]
+    if not spool.exists( uuid ):
+        sys.exit( 'closer3: no detached job {} on this host'.format( uuid ) )
+    offset = details.get( 'offset' ) or 0
+    if details.get( 'handshake' ):
+        announce( uuid = uuid, port = None, pid = None, offset = offset )
+    stream = getattr( sys.stdout, 'buffer', sys.stdout )
+
+    def write( data ):
+        stream.write( data )
+        stream.flush()
+
+    try:
+        exitCode = spool.follow( uuid, offset, write )
+    except BrokenPipeError:
+        return 1
+    except FileNotFoundError as e:
+        sys.exit( 'closer3: {}'.format( e ) )
+    if details.get( 'discard' ):
+        spool.discard( uuid )
+    return exitCode
+
 def main():
+    import argparse
     global killedByUser
     parser = argparse.ArgumentParser()
-    parser.add_argument( 'detailsHexedPickle' )
+    parser.add_argument( 'detailsHexedPickle', nargs = '?' )
+    parser.add_argument( '--details-on-stdin', dest='detailsOnStdin', action='store_true' )
     parser.add_argument( '--killer', choices = [ 'kill', 'terminate' ], default = 'terminate' )
     parser.add_argument( '--quit-when-told', dest='quitWhenTold', action='store_true' )
     parser.add_argument( '--interpret', action='store_true' )
+    parser.add_argument( '--agent', action='store_true' )
+    parser.add_argument( '--session', action='store_true' )
+    parser.add_argument( '--detach', action='store_true' )
+    parser.add_argument( '--reattach', action='store_true' )
+    parser.add_argument( '--jobs', action='store_true' )
+    parser.add_argument( '--kill-jobs', dest='killJobs', action='store_true' )
+    parser.add_argument( '--tag' )
+    parser.add_argument( '--uuid', dest='uuids', action='append' )
     arguments = parser.parse_args()
     global killer
     killer = arguments.killer
+    if arguments.jobs or arguments.killJobs:
+        _jobs( arguments )
+        return
 
+    if arguments.detailsOnStdin == ( arguments.detailsHexedPickle is not None ):
+        parser.error( 'pass launch details either as an argument or with --details-on-stdin' )
     details = interpret( arguments.detailsHexedPickle )
+    if details is None:
+        return
+    killer = details.get( 'killer' ) or killer
     if arguments.interpret:
+        import pprint
         pprint.pprint( details )
         return
 
+    if arguments.session:
+        from closer import session_server
+        session_server.SessionServer( details ).run()
+        return
+
+    if arguments.reattach:
+        sys.exit( _reattach( details ) )
+
+    if arguments.agent:
+        from closer import agent_daemon
+        agent_daemon.AgentDaemon( details[ 'uuid' ] ).run( details[ 'port' ], details.get( 'deadManWindow' ) )
+        return
+
+    global containment
+    global grace
+    global child
+    if details.get( 'grace' ) is not None:
+        grace = details[ 'grace' ]
+    if arguments.detach:
+        _detach( details )
+        return
     popenDetails = details[ 'popenDetails' ]
-    subProcess = subprocess.Popen( * popenDetails[ 'args' ], ** popenDetails[ 'kwargs' ] )
+    popenKwargs = popenDetails[ 'kwargs' ]
+    deadManWindow = details.get( 'deadManWindow' ) if arguments.quitWhenTold else None
+    controlBackend = details.get( 'controlBackend', 'stdlib' )
+    controlStream = arguments.quitWhenTold and details.get( 'controlStream', False )
+    serving = arguments.quitWhenTold and ( controlBackend != 'ssh' or controlStream )
+    if deadManWindow or controlStream:
+        popenKwargs = dict( popenKwargs )
+        popenKwargs.setdefault( 'stdin', subprocess.DEVNULL )
+    if serving:
+        server = quitWhenToldServer( details[ 'port' ], details[ 'uuid' ], controlBackend )
+    framer = None
+    if controlStream:
+        framer = server
+    elif arguments.quitWhenTold and details.get( 'handshake' ):
+        framer = _framedStandardError()
+    containment = containment_.Containment( 'closer-{}'.format( details[ 'uuid' ] ) )
+    subreaper = containment_.becomeSubreaper()
+    subProcess = subprocess.Popen( * popenDetails[ 'args' ], ** containment.popenKwargs( popenKwargs ) )
+    child = subProcess
+    containment.started( subProcess.pid )
     signal.signal( signal.SIGTERM, killAll )
-    if arguments.quitWhenTold:
-        thread = threading.Thread( target = quitWhenToldServer, args = ( details[ 'port' ], details[ 'uuid' ] ) )
+    registry.register( details[ 'uuid' ], details.get( 'tag' ), subProcess.pid )
+    if details.get( 'timeout' ) is not None:
+        deadline = watchDeadline( details[ 'timeout' ], lambda: _onDeadline( subProcess ) )
+    if serving:
+        thread = threading.Thread( target = server.serve_forever )
         thread.daemon = True
         thread.start()
-        exitCode = subProcess.wait()
+        if deadManWindow or controlStream:
+            watchController( deadManWindow, lambda: _onKill( server.stop ), { protocol.CONTROL: server.handle } if controlStream else None )
+        if framer is not None:
+            framer.announce( uuid = details[ 'uuid' ], port = None if controlStream else server.socket.getsockname()[ 1 ], pid = subProcess.pid )
+        exitCode = _waitForChild( subProcess, subreaper )
         if killedByUser:
             thread.join()
-        sys.exit( exitCode )
     else:
-        exitCode = subProcess.wait()
-        sys.exit( exitCode )
+        if framer is not None:
+            framer.announce( uuid = details[ 'uuid' ], port = None, pid = subProcess.pid )
+        exitCode = _waitForChild( subProcess, subreaper )
+    if deadlineExpired:
+        deadline.join()
+    _killLeftovers()
+    if framer is not None:
+        framer.close( timedOut = deadlineExpired )
+    registry.unregister( details[ 'uuid' ] )
+    containment.close()
+    sys.exit( exitCode )
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,244 @@
+import collections
+import os
+import signal
+import time
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+SIGNALS = { 'terminate': signal.SIGTERM, 'kill': signal.SIGKILL }
+GRACE = 5
+CONFIRM_TIMEOUT = 5
+POLL_INTERVAL = 0.01
+MAX_POLL_INTERVAL = 0.25
+PR_SET_CHILD_SUBREAPER = 36
+
+def processTable():
+    table = {}
+    try:
+        names = os.listdir( '/proc' )
+    except OSError:
+        return table
+    for name in names:
+        if not name.isdigit():
+            continue
+        try:
+            with open( '/proc/{}/stat'.format( name ), 'rb' ) as stream:
+                stat = stream.read()
+        except OSError:
+            continue
+        fields = stat[ stat.rindex( b')' ) + 2 : ].split()
+        table[ int( name ) ] = ( int( fields[ 1 ] ), int( fields[ 2 ] ) )
+    return table
+
+def descendants( pid, table ):
+    children = collections.defaultdict( list )
+    for child, ( parent, _ ) in table.items():
+        children[ parent ].append( child )
+    found = []
+    pending = [ pid ]
+    while pending:
+        for child in children[ pending.pop() ]:
+            found.append( child )
+            pending.append( child )
+    return found
+
+def becomeSubreaper():
+    try:
+        import ctypes
+        libc = ctypes.CDLL( None, use_errno = True )
+        return libc.prctl( PR_SET_CHILD_SUBREAPER, 1, 0, 0, 0 ) == 0
+    except ( ImportError, OSError, AttributeError ):
+        return False
+
+def _exitCode( status ):
+    if os.WIFSIGNALED( status ):
+        return - os.WTERMSIG( status )
+    return os.WEXITSTATUS( status )
+
+def reapUntil( process ):
+    while True:
+        try:
+            pid, status = os.waitpid( -1, 0 )
+        except ChildProcessError:
+            return process.wait()
+        if pid == process.pid:
+            process.returncode = _exitCode( status )
+            return process.returncode
+
+def reapAll( timeout = CONFIRM_TIMEOUT ):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            pid, _ = os.waitpid( -1, os.WNOHANG )
+        except ChildProcessError:
+            return True
+        if pid == 0:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep( POLL_INTERVAL )
+
+def _ownCgroup():
+    try:
+        with open( '/proc/self/cgroup' ) as cgroups:
+            for line in cgroups:
+                hierarchy, _, path = line.rstrip( '\n' ).split( ':', 2 )
+                if hierarchy == '0':
+                    return path
+    except OSError:
+        pass
+    return None
+
+def transientCgroup( name ):
+    if not os.path.exists( os.path.join( CGROUP_ROOT, 'cgroup.controllers' ) ):
+        return None
+    own = _ownCgroup()
+    if own is None:
+        return None
+    path = os.path.join( CGROUP_ROOT, own.lstrip( '/' ), name )
+    try:
+        os.mkdir( path )
+    except OSError:
+        return None
+    return path
+
+def _signal( send ):
+    try:
+        send()
+    except ( ProcessLookupError, PermissionError ):
+        pass
+
+def _alive( process ):
+    import psutil
+    try:
+        return process.status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return False
+
+def _snapshot( pids ):
+    import psutil
+    processes = []
+    for pid in pids:
+        try:
+            processes.append( psutil.Process( pid ) )
+        except psutil.NoSuchProcess:
+            pass
+    return processes
+
+def waitForDeath( processes, timeout ):
+    deadline = time.monotonic() + timeout
+    interval = POLL_INTERVAL
+    while True:
+        processes = [ process for process in processes if _alive( process ) ]
+        remaining = deadline - time.monotonic()
+        if not processes or remaining <= 0:
+            return processes
+        time.sleep( min( interval, remaining ) )
+        interval = min( interval * 2, MAX_POLL_INTERVAL )
+
+class Containment( object ):
+    def __init__( self, cgroupName = None ):
+        self._cgroup = None if cgroupName is None else transientCgroup( cgroupName )
+        self._pid = None
+
+    @property
+    def cgroup( self ):
+        return self._cgroup
+
+    @property
+    def processGroup( self ):
+        return self._pid
+
+    def popenKwargs( self, kwargs ):
+        kwargs = dict( kwargs )
+        kwargs[ 'start_new_session' ] = True
+        if self._cgroup is None:
+            return kwargs
+        procs = os.path.join( self._cgroup, 'cgroup.procs' )
+        original = kwargs.get( 'preexec_fn' )
+        def enterCgroup():
+            try:
+                with open( procs, 'w' ) as stream:
+                    stream.write( str( os.getpid() ) )
+            except OSError:
+                pass
+            if original is not None:
+                original()
+        kwargs[ 'preexec_fn' ] = enterCgroup
+        return kwargs
+
+    def started( self, pid ):
+        self._pid = pid
+
+    def occupied( self, root ):
+        if descendants( root, processTable() ):
+            return True
+        if self._cgroup is not None:
+            try:
+                with open( os.path.join( self._cgroup, 'cgroup.procs' ) ) as stream:
+                    if stream.read().strip():
+                        return True
+            except OSError:
+                pass
+        if self._pid is None:
+            return False
+        try:
+            os.killpg( self._pid, 0 )
+        except ( ProcessLookupError, PermissionError ):
+            return False
+        return True
+
+    def kill( self, killer, root = None, grace = GRACE ):
+        start = time.monotonic()
+        tree = []
+        escapees = []
+        if root is not None:
+            table = processTable()
+            tree = descendants( root, table )
+            escapees = [ pid for pid in tree if table[ pid ][ 1 ] != self._pid ]
+        if self._pid is not None and self._pid not in tree:
+            tree.append( self._pid )
+        processes = _snapshot( tree )
+        signalNumber = SIGNALS[ killer ]
+        self._send( signalNumber, escapees )
+        survivors = processes
+        if signalNumber != signal.SIGKILL:
+            survivors = waitForDeath( survivors, grace )
+            if survivors:
+                self._send( signal.SIGKILL, [ process.pid for process in survivors ] )
+        survivors = waitForDeath( survivors, CONFIRM_TIMEOUT )
+        return dict( elapsed = time.monotonic() - start, survivors = [ process.pid for process in survivors ] )
+
+    def signal( self, signalNumber ):
+        self._send( signalNumber, [] )
+
+    def _send( self, signalNumber, pids ):
+        self._killCgroup( signalNumber )
+        if self._pid is not None:
+            _signal( lambda: os.killpg( self._pid, signalNumber ) )
+        for pid in pids:
+            _signal( lambda: os.kill( pid, signalNumber ) )
+
+    def _killCgroup( self, signalNumber ):
+        if self._cgroup is None:
+            return
+        if signalNumber == signal.SIGKILL:
+            try:
+                with open( os.path.join( self._cgroup, 'cgroup.kill' ), 'w' ) as stream:
+                    stream.write( '1' )
+                return
+            except OSError:
+                pass
+        try:
+            with open( os.path.join( self._cgroup, 'cgroup.procs' ) ) as stream:
+                pids = [ int( line ) for line in stream if line.strip() ]
+        except OSError:
+            return
+        for pid in pids:
+            _signal( lambda: os.kill( pid, signalNumber ) )
+
+    def close( self ):
+        if self._cgroup is None:
+            return
+        try:
+            os.rmdir( self._cgroup )
+        except OSError:
+            pass
@@ -0,0 +1,71 @@
+import socket
+import threading
+import time
+import requests
+import requests.adapters
+
+CONNECT_TIMEOUT = 3
+READ_TIMEOUT = 10
+RESOLVE_TTL = 60
+HOST_POOLS = 1024
+CONNECTIONS_PER_HOST = 4
+
+def _bracketed( host ):
+    if ':' in host and not host.startswith( '[' ):
+        return '[{}]'.format( host )
+    return host
+
+class ControlClient( object ):
+    def __init__( self, connectTimeout = CONNECT_TIMEOUT, readTimeout = READ_TIMEOUT, resolveTTL = RESOLVE_TTL, hostPools = HOST_POOLS, connectionsPerHost = CONNECTIONS_PER_HOST ):
+        self._timeout = ( connectTimeout, readTimeout )
+        self._resolveTTL = resolveTTL
+        self._adapter = requests.adapters.HTTPAdapter( pool_connections = hostPools, pool_maxsize = connectionsPerHost )
+        self._sessions = threading.local()
+        self._resolved = {}
+        self._lock = threading.Lock()
+
+    @property
+    def timeout( self ):
+        return self._timeout
+
+    def _session( self ):
+        session = getattr( self._sessions, 'session', None )
+        if session is None:
+            session = requests.Session()
+            session.mount( 'http://', self._adapter )
+            self._sessions.session = session
+        return session
+
+    def resolve( self, host ):
+        now = time.monotonic()
+        with self._lock:
+            cached = self._resolved.get( host )
+        if cached is not None and cached[ 1 ] > now:
+            return cached[ 0 ]
+        try:
+            address = socket.getaddrinfo( host, None, type = socket.SOCK_STREAM )[ 0 ][ 4 ][ 0 ]
+        except socket.gaierror as e:
+            raise requests.exceptions.ConnectionError( 'cannot resolve {}: {}'.format( host, e ) )
+        with self._lock:
+            self._resolved[ host ] = ( address, now + self._resolveTTL )
+        return address
+
+    def forget( self, host ):
+        with self._lock:
+            self._resolved.pop( host, None )
+
+    def request( self, method, host, port, path, timeout = None, token = None, ** kwargs ):
+        url = 'http://{}:{}{}'.format( _bracketed( self.resolve( host ) ), port, path )
+        headers = { 'Host': '{}:{}'.format( _bracketed( host ), port ) }
+        if token is not None:
+            headers[ 'X-Closer-Token' ] = token
+        try:
+            response = self._session().request( method, url, headers = headers, timeout = timeout or self._timeout, ** kwargs )
+        except requests.exceptions.ConnectionError:
+            self.forget( host )
+            raise
+        response.raise_for_status()
+        return response.text
+
+    def get( self, host, port, path, ** kwargs ):
+        return self.request( 'GET', host, port, path, ** kwargs )
@@ -0,0 +1,78 @@
+import socketserver
+import threading
+
+STATUS = { 200: 'OK', 403: 'Forbidden', 404: 'Not Found', 500: 'Internal Server Error' }
+MAX_LINE = 65536
+
+def _parseQuery( query ):
+    if not query:
+        return {}
+    import urllib.parse
+    return dict( urllib.parse.parse_qsl( query ) )
+
+class _Handler( socketserver.StreamRequestHandler ):
+    def handle( self ):
+        while self._serveRequest():
+            pass
+
+    def _serveRequest( self ):
+        requestLine = self.rfile.readline( MAX_LINE )
+        try:
+            method, target, version = requestLine.decode( 'latin-1' ).split()
+        except ValueError:
+            return False
+        headers = {}
+        for line in iter( lambda: self.rfile.readline( MAX_LINE ), b'' ):
+            if line in ( b'\r\n', b'\n' ):
+                break
+            name, _, value = line.decode( 'latin-1' ).partition( ':' )
+            headers[ name.strip().lower() ] = value.strip()
+        body = self.rfile.read( int( headers.get( 'content-length', 0 ) ) )
+        path, _, query = target.partition( '?' )
+        status, body = self._dispatch( method, path, _parseQuery( query ), headers, body )
+        keepAlive = version == 'HTTP/1.1' and headers.get( 'connection', '' ).lower() != 'close' and not self.server.stopping
+        self._respond( status, body, keepAlive )
+        return keepAlive
+
+    def _dispatch( self, method, path, query, headers, body ):
+        if not self.server.authorized( headers.get( 'x-closer-token', '' ) ):
+            return 403, 'forbidden'
+        route = self.server.routes.get( path )
+        if route is None:
+            return 404, 'not found'
+        try:
+            if method == 'POST':
+                return 200, route( body, ** query )
+            return 200, route( ** query )
+        except Exception as e:
+            return 500, 'closer control request failed: {!r}'.format( e )
+
+    def _respond( self, status, body, keepAlive ):
+        if not isinstance( body, bytes ):
+            body = str( body ).encode()
+        head = 'HTTP/1.1 {} {}\r\nContent-Type: text/plain\r\nContent-Length: {}\r\nConnection: {}\r\n\r\n'.format(
+                status, STATUS[ status ], len( body ), 'keep-alive' if keepAlive else 'close' )
+        self.wfile.write( head.encode( 'latin-1' ) + body )
+
+class ControlServer( socketserver.ThreadingMixIn, socketserver.TCPServer ):
+    daemon_threads = True
+
+    def __init__( self, listener, routes, token = None ):
+        socketserver.TCPServer.__init__( self, listener.getsockname(), _Handler, bind_and_activate = False )
+        self.socket.close()
+        self.socket = listener
+        self.routes = routes
+        self.stopping = False
+        self._token = token
+
+    def stop( self ):
+        self.stopping = True
+        shutdown = threading.Thread( target = self.shutdown )
+        shutdown.daemon = True
+        shutdown.start()
+
+    def authorized( self, token ):
+        if self._token is None:
+            return True
+        import hmac
+        return hmac.compare_digest( token.encode(), self._token.encode() )
@@ -0,0 +1,40 @@
+import collections
+import threading
+import time
+
+class FanOut( object ):
+    def __init__( self, function, items ):
+        self._function = function
+        self._pending = collections.deque( items )
+        self._total = len( self._pending )
+        self._outcomes = {}
+        self._condition = threading.Condition()
+
+    def run( self, workers, deadline = None ):
+        for _ in range( min( workers, self._total ) ):
+            thread = threading.Thread( target = self._work )
+            thread.daemon = True
+            thread.start()
+        end = None if deadline is None else time.monotonic() + deadline
+        with self._condition:
+            while len( self._outcomes ) < self._total:
+                remaining = None if end is None else end - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                self._condition.wait( remaining )
+            self._pending.clear()
+            return dict( self._outcomes )
+
+    def _work( self ):
+        while True:
+            with self._condition:
+                if not self._pending:
+                    return
+                item = self._pending.popleft()
+            try:
+                outcome = ( None, self._function( item ) )
+            except Exception as e:
+                outcome = ( e, None )
+            with self._condition:
+                self._outcomes[ item ] = outcome
+                self._condition.notify_all()
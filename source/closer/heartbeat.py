@@ -0,0 +1,70 @@
+import logging
+import os
+import threading
+import time
+from closer import protocol
+
+BEAT = protocol.frame( protocol.HEARTBEAT, b'' )
+
+class Heartbeat( object ):
+    def __init__( self ):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._streams = {}
+        self._thread = None
+
+    def add( self, fd, interval, writeLock = None ):
+        fd = os.dup( fd )
+        with self._lock:
+            self._streams[ fd ] = [ interval, time.monotonic() + interval, writeLock ]
+            if self._thread is None:
+                self._thread = threading.Thread( target = self._loop, name = 'closer-heartbeat' )
+                self._thread.daemon = True
+                self._thread.start()
+        self._wake.set()
+        return fd
+
+    def remove( self, fd ):
+        with self._lock:
+            if self._streams.pop( fd, None ) is None:
+                return
+        os.close( fd )
+
+    def _loop( self ):
+        while True:
+            self._wake.clear()
+            now = time.monotonic()
+            with self._lock:
+                due = [ fd for fd, schedule in self._streams.items() if schedule[ 1 ] <= now ]
+            for fd in due:
+                self._beat( fd, now )
+            with self._lock:
+                nextBeat = min( ( schedule[ 1 ] for schedule in self._streams.values() ), default = None )
+            self._wake.wait( None if nextBeat is None else max( 0, nextBeat - time.monotonic() ) )
+
+    def _beat( self, fd, now ):
+        with self._lock:
+            schedule = self._streams.get( fd )
+        if schedule is None:
+            return
+        writeLock = schedule[ 2 ]
+        if writeLock is None or writeLock.acquire( blocking = False ):
+            try:
+                if protocol.writable( fd, 0 ):
+                    os.write( fd, BEAT )
+            except BlockingIOError:
+                pass
+            except OSError:
+                self.remove( fd )
+                return
+            except Exception:
+                logging.exception( 'closer heartbeat stream {} failed, dropping it'.format( fd ) )
+                self.remove( fd )
+                return
+            finally:
+                if writeLock is not None:
+                    writeLock.release()
+        with self._lock:
+            schedule = self._streams.get( fd )
+            if schedule is not None:
+                schedule[ 1 ] = now + schedule[ 0 ]
@@ -0,0 +1,50 @@
+import collections
+import json
+import os
+import time
+
+LAUNCHED = 'launched'
+ENDED = 'ended'
+
+class Journal( object ):
+    def __init__( self, path ):
+        self._path = os.path.expanduser( path )
+
+    @property
+    def path( self ):
+        return self._path
+
+    def __repr__( self ):
+        return 'closer journal {}'.format( self._path )
+
+    def _append( self, entry ):
+        line = ( json.dumps( entry, sort_keys = True ) + '\n' ).encode()
+        fd = os.open( self._path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600 )
+        try:
+            os.write( fd, line )
+        finally:
+            os.close( fd )
+
+    def launched( self, user, host, sshPort, sshOptions, closer, port, uuid, tag ):
+        self._append( dict( event = LAUNCHED, time = time.time(), user = user, host = host, sshPort = sshPort, sshOptions = sshOptions, closer = closer, port = port, uuid = uuid, tag = tag ) )
+
+    def ended( self, uuid ):
+        self._append( dict( event = ENDED, time = time.time(), uuid = uuid ) )
+
+    def orphans( self ):
+        launched = collections.OrderedDict()
+        try:
+            file = open( self._path )
+        except FileNotFoundError:
+            return []
+        with file:
+            for line in file:
+                try:
+                    entry = json.loads( line )
+                except ValueError:
+                    continue
+                if entry.get( 'event' ) == LAUNCHED:
+                    launched[ entry[ 'uuid' ] ] = entry
+                elif entry.get( 'event' ) == ENDED:
+                    launched.pop( entry[ 'uuid' ], None )
+        return list( launched.values() )
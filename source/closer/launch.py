@@ -0,0 +1,41 @@
+import concurrent.futures
+import time
+from closer import exceptions
+
+class Launch( object ):
+    def __init__( self, remote ):
+        self._remote = remote
+        self._started = time.monotonic()
+        self._latency = None
+        self._ready = concurrent.futures.Future()
+
+    @property
+    def remote( self ):
+        return self._remote
+
+    @property
+    def ready( self ):
+        return self._ready
+
+    @property
+    def latency( self ):
+        return self._latency
+
+    def wait( self, timeout = None ):
+        return self._ready.result( timeout )
+
+    def _handshake( self, handshake ):
+        if self._ready.done():
+            return
+        self._latency = time.monotonic() - self._started
+        self._ready.set_result( handshake )
+
+    def _noHandshake( self ):
+        if self._ready.done():
+            return
+        self._ready.set_exception( exceptions.RemoteProcessException( 'remote closer ended without a handshake: {}'.format( self._remote ) ) )
+
+    def _unavailable( self, reason ):
+        if self._ready.done():
+            return
+        self._ready.set_exception( exceptions.RemoteProcessException( 'cannot tell when {} is ready: {}'.format( self._remote, reason ) ) )
@@ -0,0 +1,91 @@
+import json
+import os
+import select
+import struct
+
+HANDSHAKE_PREFIX = b'closer3-handshake: '
+FRAME_HEADER = struct.Struct( '!BI' )
+DETAILS = 1
+HEARTBEAT = 2
+CONTROL = 3
+REPLY = 4
+STDERR = 5
+COMMAND = 6
+RESULT = 7
+OUTCOME = 8
+RESULT_HEADER = struct.Struct( '!Ii?i' )
+
+def handshakeLine( ** fields ):
+    return HANDSHAKE_PREFIX + json.dumps( fields, sort_keys = True ).encode() + b'\n'
+
+def parseHandshake( line ):
+    if not line.startswith( HANDSHAKE_PREFIX ):
+        return None
+    try:
+        return json.loads( line[ len( HANDSHAKE_PREFIX ) : ].decode() )
+    except ValueError:
+        return None
+
+def frame( kind, payload ):
+    return FRAME_HEADER.pack( kind, len( payload ) ) + payload
+
+def writable( fd, timeout = None ):
+    poller = select.poll()
+    poller.register( fd, select.POLLOUT )
+    return bool( poller.poll( None if timeout is None else timeout * 1000 ) )
+
+def writeFrame( fd, kind, payload ):
+    data = frame( kind, payload )
+    while data:
+        try:
+            written = os.write( fd, data )
+        except BlockingIOError:
+            writable( fd )
+            continue
+        data = data[ written : ]
+
+def result( id_, returncode, stdout, stderr, timedOut = False ):
+    return RESULT_HEADER.pack( id_, returncode, timedOut, len( stdout ) ) + stdout + stderr
+
+def parseResult( payload ):
+    id_, returncode, timedOut, stdoutLength = RESULT_HEADER.unpack_from( payload )
+    stdout = payload[ RESULT_HEADER.size : RESULT_HEADER.size + stdoutLength ]
+    stderr = payload[ RESULT_HEADER.size + stdoutLength : ]
+    return id_, returncode, timedOut, stdout, stderr
+
+def _readExactly( fd, count ):
+    chunks = []
+    while count > 0:
+        chunk = os.read( fd, count )
+        if not chunk:
+            return None
+        chunks.append( chunk )
+        count -= len( chunk )
+    return b''.join( chunks )
+
+def readFrame( fd ):
+    header = _readExactly( fd, FRAME_HEADER.size )
+    if header is None:
+        return None
+    kind, length = FRAME_HEADER.unpack( header )
+    payload = _readExactly( fd, length )
+    if payload is None:
+        raise EOFError( 'truncated closer frame: expected {} bytes'.format( length ) )
+    return kind, payload
+
+
+class FrameDecoder( object ):
+    def __init__( self ):
+        self._buffer = b''
+
+    def feed( self, data ):
+        self._buffer += data
+        frames = []
+        while len( self._buffer ) >= FRAME_HEADER.size:
+            kind, length = FRAME_HEADER.unpack_from( self._buffer )
+            end = FRAME_HEADER.size + length
+            if len( self._buffer ) < end:
+                break
+            frames.append( ( kind, self._buffer[ FRAME_HEADER.size : end ] ) )
+            self._buffer = self._buffer[ end : ]
+        return frames
@@ -0,0 +1,271 @@
+import collections
+import logging
+import os
+import queue
+import selectors
+import threading
+import time
+
+CHUNK = 65536
+PROCESS_POLL_INTERVAL = 0.1
+CALLBACK_WORKERS = 16
+
+class _Stream( object ):
+    def __init__( self, onData, onEOF ):
+        self.onData = onData
+        self.onEOF = onEOF
+
+class _ProcessWatch( object ):
+    def __init__( self, process, onExit ):
+        self.process = process
+        self.onExit = onExit
+
+class LineSplitter( object ):
+    def __init__( self, onLine ):
+        self._onLine = onLine
+        self._partial = b''
+
+    def feed( self, data ):
+        lines = ( self._partial + data ).split( b'\n' )
+        self._partial = lines.pop()
+        for line in lines:
+            self._onLine( line + b'\n' )
+
+    def flush( self ):
+        if self._partial:
+            self._onLine( self._partial )
+            self._partial = b''
+
+class SerialCallbacks( object ):
+    def __init__( self, dispatcher ):
+        self._dispatcher = dispatcher
+        self._calls = collections.deque()
+        self._scheduled = False
+        self._lock = threading.Lock()
+
+    def call( self, function, * args ):
+        with self._lock:
+            self._calls.append( ( function, args ) )
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._dispatcher._schedule( self )
+
+    def _drain( self ):
+        while True:
+            with self._lock:
+                if not self._calls:
+                    self._scheduled = False
+                    return
+                function, args = self._calls.popleft()
+            try:
+                function( * args )
+            except Exception:
+                logging.exception( 'closer callback failed' )
+
+class Dispatcher( object ):
+    def __init__( self, workers = CALLBACK_WORKERS ):
+        self._workers = workers
+        self._ready = queue.Queue()
+        self._threads = 0
+        self._idle = 0
+        self._backlog = 0
+        self._lock = threading.Lock()
+
+    def serial( self ):
+        return SerialCallbacks( self )
+
+    def _schedule( self, callbacks ):
+        with self._lock:
+            spawn = False
+            if self._idle:
+                self._idle -= 1
+            elif self._threads < self._workers:
+                self._threads += 1
+                spawn = True
+            else:
+                self._backlog += 1
+        self._ready.put( callbacks )
+        if spawn:
+            thread = threading.Thread( target = self._work, name = 'closer-callbacks' )
+            thread.daemon = True
+            thread.start()
+
+    def _work( self ):
+        while True:
+            self._ready.get()._drain()
+            with self._lock:
+                if self._backlog:
+                    self._backlog -= 1
+                else:
+                    self._idle += 1
+
+class ProcessMonitor( object ):
+    def __init__( self, onOutput, onProcessEnd = None, callbacks = None ):
+        self._onOutput = onOutput
+        self._onProcessEnd = onProcessEnd
+        self._callbacks = callbacks
+        self._outputDone = False
+        self._exited = False
+        self._exitCode = None
+
+    def onLine( self, line ):
+        self._call( self._onOutput, line.decode( 'latin-1' ).strip() )
+
+    def onEOF( self ):
+        self._outputDone = True
+        self._maybeEnd()
+
+    def onExit( self, exitCode ):
+        self._exited = True
+        self._exitCode = exitCode
+        self._maybeEnd()
+
+    def _maybeEnd( self ):
+        if self._outputDone and self._exited and self._onProcessEnd is not None:
+            self._call( self._onProcessEnd, self._exitCode )
+
+    def _call( self, function, * args ):
+        if self._callbacks is None:
+            function( * args )
+            return
+        self._callbacks.call( function, * args )
+
+class Reactor( object ):
+    def __init__( self, threaded = True ):
+        self._threaded = threaded
+        self._selector = selectors.DefaultSelector()
+        self._lock = threading.RLock()
+        self._polled = []
+        self._thread = None
+        self._wakeReader, self._wakeWriter = os.pipe()
+        os.set_blocking( self._wakeReader, False )
+        os.set_blocking( self._wakeWriter, False )
+        self._selector.register( self._wakeReader, selectors.EVENT_READ, None )
+        self._dispatcher = Dispatcher()
+        self._driver = None
+
+    def serial( self ):
+        return self._dispatcher.serial()
+
+    def onReactorThread( self ):
+        return threading.get_ident() == self._driver
+
+    def wait( self, future, timeout = None ):
+        if not self.onReactorThread():
+            return future.result( timeout )
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not future.done():
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            self.step( PROCESS_POLL_INTERVAL if remaining is None else min( remaining, PROCESS_POLL_INTERVAL ) )
+        return future.result( 0 )
+
+    def fileno( self ):
+        return self._selector.fileno()
+
+    def addStream( self, fd, onData, onEOF ):
+        os.set_blocking( fd, False )
+        with self._lock:
+            self._selector.register( fd, selectors.EVENT_READ, _Stream( onData, onEOF ) )
+        self._wake()
+
+    def addLines( self, fd, onLine, onEOF ):
+        splitter = LineSplitter( onLine )
+        def eof():
+            splitter.flush()
+            onEOF()
+        self.addStream( fd, splitter.feed, eof )
+
+    def watchProcess( self, process, onExit ):
+        watch = _ProcessWatch( process, onExit )
+        try:
+            pidfd = os.pidfd_open( process.pid )
+        except ( AttributeError, OSError ):
+            with self._lock:
+                self._polled.append( watch )
+        else:
+            with self._lock:
+                self._selector.register( pidfd, selectors.EVENT_READ, watch )
+        self._wake()
+
+    def _wake( self ):
+        if self._threaded:
+            self._ensureThread()
+        try:
+            os.write( self._wakeWriter, b'x' )
+        except BlockingIOError:
+            pass
+
+    def _ensureThread( self ):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread( target = self._loop, name = 'closer-reactor' )
+            self._thread.daemon = True
+            self._thread.start()
+
+    def _loop( self ):
+        while True:
+            self.step( None )
+
+    def step( self, timeout = 0 ):
+        if self._polled and ( timeout is None or timeout > PROCESS_POLL_INTERVAL ):
+            timeout = PROCESS_POLL_INTERVAL
+        self._driver = threading.get_ident()
+        for key, events in self._selector.select( timeout ):
+            if self._selector.get_map().get( key.fd ) is not key:
+                continue
+            try:
+                if key.data is None:
+                    self._drainWake()
+                elif isinstance( key.data, _ProcessWatch ):
+                    self._processExited( key.fd, key.data )
+                else:
+                    self._read( key.fd, key.data )
+            except Exception:
+                logging.exception( 'closer reactor callback failed' )
+        self._pollProcesses()
+
+    def _drainWake( self ):
+        try:
+            while os.read( self._wakeReader, CHUNK ):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _read( self, fd, stream ):
+        try:
+            data = os.read( fd, CHUNK )
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+        if data:
+            stream.onData( data )
+            return
+        with self._lock:
+            self._selector.unregister( fd )
+        os.close( fd )
+        stream.onEOF()
+
+    def _processExited( self, pidfd, watch ):
+        with self._lock:
+            self._selector.unregister( pidfd )
+        os.close( pidfd )
+        watch.onExit( watch.process.wait() )
+
+    def _pollProcesses( self ):
+        with self._lock:
+            polled = list( self._polled )
+        for watch in polled:
+            exitCode = watch.process.poll()
+            if exitCode is None:
+                continue
+            with self._lock:
+                self._polled.remove( watch )
+            try:
+                watch.onExit( exitCode )
+            except Exception:
+                logging.exception( 'closer reactor callback failed' )
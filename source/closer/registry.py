@@ -0,0 +1,92 @@
+import json
+import os
+import signal
+import time
+
+DIRECTORY = os.path.join( '~', '.closer', 'jobs' )
+POLL_INTERVAL = 0.1
+STAT_START_TIME = 19
+
+def _path( uuid ):
+    if not uuid or os.path.basename( uuid ) != uuid or uuid.startswith( '.' ):
+        raise ValueError( 'not a closer job uuid: {!r}'.format( uuid ) )
+    return os.path.join( os.path.expanduser( DIRECTORY ), uuid + '.json' )
+
+def register( uuid, tag, pid ):
+    path = _path( uuid )
+    os.makedirs( os.path.dirname( path ), mode = 0o700, exist_ok = True )
+    entry = dict( uuid = uuid, tag = tag, started = time.time(), pid = pid, supervisor = os.getpid(), supervisorStart = _startTime( os.getpid() ) )
+    temporary = path + '.tmp'
+    with open( temporary, 'w' ) as file:
+        json.dump( entry, file )
+    os.rename( temporary, path )
+
+def unregister( uuid ):
+    try:
+        os.unlink( _path( uuid ) )
+    except FileNotFoundError:
+        pass
+
+def _startTime( pid ):
+    try:
+        with open( '/proc/{}/stat'.format( pid ), 'rb' ) as stream:
+            stat = stream.read()
+    except OSError:
+        return None
+    return int( stat[ stat.rindex( b')' ) + 2 : ].split()[ STAT_START_TIME ] )
+
+def _alive( entry ):
+    pid = entry[ 'supervisor' ]
+    try:
+        os.kill( pid, 0 )
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    started = entry.get( 'supervisorStart' )
+    return started is None or _startTime( pid ) == started
+
+def _running( entry ):
+    return os.path.exists( _path( entry[ 'uuid' ] ) ) and _alive( entry )
+
+def jobs( tag = None, uuids = None ):
+    directory = os.path.expanduser( DIRECTORY )
+    try:
+        names = sorted( os.listdir( directory ) )
+    except FileNotFoundError:
+        return []
+    entries = []
+    for name in names:
+        if not name.endswith( '.json' ):
+            continue
+        try:
+            with open( os.path.join( directory, name ) ) as file:
+                entry = json.load( file )
+        except ( OSError, ValueError ):
+            continue
+        if not _alive( entry ):
+            unregister( entry[ 'uuid' ] )
+            continue
+        if tag is not None and entry[ 'tag' ] != tag:
+            continue
+        if uuids and entry[ 'uuid' ] not in uuids:
+            continue
+        entries.append( entry )
+    return entries
+
+def kill( entries, timeout ):
+    start = time.monotonic()
+    for entry in entries:
+        if not _alive( entry ):
+            continue
+        try:
+            os.kill( entry[ 'supervisor' ], signal.SIGTERM )
+        except ProcessLookupError:
+            pass
+    pending = list( entries )
+    while pending and time.monotonic() - start < timeout:
+        time.sleep( POLL_INTERVAL )
+        pending = [ entry for entry in pending if _running( entry ) ]
+    return dict( killed = [ entry[ 'uuid' ] for entry in entries if entry not in pending ],
+                 survivors = [ entry[ 'uuid' ] for entry in pending ],
+                 elapsed = time.monotonic() - start )
@@ -1,4 +1,7 @@
 import subprocess
+import concurrent.futures
+import os
+import sys
 import uuid
 import codecs
 import logging
@@ -6,34 +9,192 @@ import random
 import requests
 import atexit
 import pickle
-import pimped_subprocess
+import json
+import collections
+import threading
 from closer import exceptions
-from closer import find_remote_control_port
+from closer import channel
+from closer import launch
+from closer import fan_out
+from closer import control_client
+from closer import ssh_pool
+from closer import reactor
+from closer import protocol
+from closer import containment
+from closer import heartbeat
+from closer import stream_control
+from closer import journal
 
 PORT_RANGE = 64000, 65500
+READY_TIMEOUT = 30
+LEGACY_CLOSERS = [ 'closer' ]
+DETAILS_PICKLE_PROTOCOL = 4
+DEAD_MAN_WINDOW = 30
+HEARTBEATS_PER_WINDOW = 3
+_AUTOMATIC = object()
+DEADLINE_SLACK = 5
+OUTCOME_TIMEOUT = 5
+SSH_ERROR_EXIT_CODE = 255
+TIDY_UP_WORKERS = 32
+TIDY_UP_DEADLINE = 30
+
+class TidyUpReport( object ):
+    def __init__( self, killed, failed, timedOut ):
+        self.killed = killed
+        self.failed = failed
+        self.timedOut = timedOut
+
+    def __repr__( self ):
+        return 'TidyUpReport( killed = {}, failed = {}, timedOut = {} )'.format( len( self.killed ), len( self.failed ), len( self.timedOut ) )
+
+class KillReport( object ):
+    def __init__( self, elapsed, survivors ):
+        self.elapsed = elapsed
+        self.survivors = survivors
+
+    @property
+    def confirmed( self ):
+        return not self.survivors
+
+    @classmethod
+    def parse( cls, text ):
+        try:
+            report = json.loads( text )
+            return cls( report[ 'elapsed' ], report[ 'survivors' ] )
+        except ( ValueError, TypeError, KeyError ):
+            return None
+
+    def __repr__( self ):
+        return 'KillReport( elapsed = {:.3f}, survivors = {} )'.format( self.elapsed, self.survivors )
+
+class JobsKillReport( object ):
+    def __init__( self, killed, survivors, elapsed ):
+        self.killed = killed
+        self.survivors = survivors
+        self.elapsed = elapsed
+
+    @property
+    def confirmed( self ):
+        return not self.survivors
+
+    @classmethod
+    def parse( cls, text ):
+        report = json.loads( text )
+        return cls( report[ 'killed' ], report[ 'survivors' ], report[ 'elapsed' ] )
+
+    def __repr__( self ):
+        return 'JobsKillReport( elapsed = {:.3f}, killed = {}, survivors = {} )'.format( self.elapsed, len( self.killed ), self.survivors )
 
 class Remote( object ):
     _cleanup = []
+    sshPool = ssh_pool.SSHPool()
+    controlClient = control_client.ControlClient()
+    reactor = reactor.Reactor()
+    heartbeat = heartbeat.Heartbeat()
+    warmPool = None
+    journal = None
 
     @classmethod
-    def tidyUp( cls, * args ):
-        for remote in cls._cleanup:
-            remote.terminate()
+    def tidyUp( cls, * args, workers = TIDY_UP_WORKERS, timeout = None, deadline = TIDY_UP_DEADLINE ):
+        return Remote._killInParallel( cls._cleanup, workers, timeout, deadline )
+
+    @staticmethod
+    def _killInParallel( remotes, workers, timeout, deadline ):
+        remotes = list( remotes )
+        alive = [ remote for remote in remotes if not remote._terminated ]
+        outcomes = fan_out.FanOut( lambda remote: remote._kill( timeout ), alive ).run( workers, deadline )
+        killed = [ remote for remote in remotes if remote._terminated ]
+        failed = []
+        timedOut = []
+        for remote in alive:
+            if remote not in outcomes:
+                logging.error( 'tidyUp deadline passed before {} was killed'.format( remote ) )
+                timedOut.append( remote )
+                continue
+            error, _ = outcomes[ remote ]
+            if error is None:
+                continue
+            logging.error( 'exception {} happened while killing {}. This may not be a problem if the process already died on the remote side'.format( error, remote ) )
+            if isinstance( error, requests.exceptions.Timeout ):
+                timedOut.append( remote )
+            else:
+                failed.append( remote )
+        return TidyUpReport( killed, failed, timedOut )
+
+    @staticmethod
+    def reap( journal_, workers = TIDY_UP_WORKERS, timeout = READY_TIMEOUT, deadline = TIDY_UP_DEADLINE ):
+        if not isinstance( journal_, journal.Journal ):
+            journal_ = journal.Journal( journal_ )
+        hosts = collections.OrderedDict()
+        for entry in journal_.orphans():
+            key = ( entry[ 'user' ], entry[ 'host' ], entry[ 'sshPort' ], entry[ 'sshOptions' ], entry[ 'closer' ] )
+            hosts.setdefault( key, [] ).append( entry[ 'uuid' ] )
+        outcomes = fan_out.FanOut( lambda key: Remote._reapHost( key, hosts[ key ], timeout ), list( hosts ) ).run( workers, deadline )
+        killed = []
+        failed = []
+        timedOut = []
+        for key, uuids in hosts.items():
+            if key not in outcomes:
+                logging.error( 'reap deadline passed before orphans on {} were killed'.format( key[ 1 ] ) )
+                timedOut += uuids
+                continue
+            error, report = outcomes[ key ]
+            if error is not None:
+                logging.error( 'exception {} happened while reaping orphans on {}'.format( error, key[ 1 ] ) )
+                if isinstance( error, exceptions.RemoteProcessTimeout ):
+                    timedOut += uuids
+                else:
+                    failed += uuids
+                continue
+            killed += report.killed
+            failed += report.survivors
+            for uuid_ in uuids:
+                if uuid_ not in report.survivors:
+                    journal_.ended( uuid_ )
+        return TidyUpReport( killed, failed, timedOut )
+
+    @staticmethod
+    def _reapHost( key, uuids, timeout ):
+        user, host, sshPort, sshOptions, closer = key
+        remote = Remote( user, host )
+        remote.sshPort = sshPort
+        remote.sshOptions( sshOptions )
+        remote.setCloserCommand( closer )
+        return remote.killJobs( uuids = uuids, timeout = timeout )
 
     def __init__( self, user, host, * popenArgs, ** popenKwargs ):
         self._user = user
         self._host = host
-        random.seed()
-        self._port = random.randint( * PORT_RANGE )
+        self._requestedPort = None
+        self._port = None
         self._sshTarget = '{}@{}'.format( self._user, self._host )
         self._ownKwargs = {}
         self._killer = 'terminate'
+        self._grace = None
+        self._killReport = None
+        self._deadManSwitch = _AUTOMATIC
+        self._deadManWindow = None
+        self._timeout = None
+        self._deadlineExpired = False
+        self._channel = None
+        self._controlStream = False
+        self._streamControl = None
         self._remotePopenDetails = dict( args = popenArgs, kwargs = popenKwargs )
         self._terminated = False
         self._closer = 'closer3'
+        self._detailsOnStdin = True
+        self._controlBackend = 'stdlib'
         self._sshPort = 22
         self._sshOptions = ''
         self._uuid = str( uuid.uuid4() )
+        self._launch = None
+        self._agent = None
+        self._process = None
+        self._offset = 0
+        self._discard = False
+        self._tag = None
+        self._journaled = False
+        self._journalPending = False
 
     @property
     def host( self ):
@@ -43,12 +204,29 @@ class Remote( object ):
     def uuid( self ):
         return self._uuid
 
+    @uuid.setter
+    def uuid( self, uuid ):
+        self._uuid = uuid
+
+    @property
+    def offset( self ):
+        return self._offset
+
+    @property
+    def tag( self ):
+        return self._tag
+
+    def setTag( self, tag ):
+        self._tag = tag
+        return self
+
     @property
     def controlPort( self ):
         return self._port
 
     @controlPort.setter
     def controlPort( self, port ):
+        self._requestedPort = port
         self._port = port
 
     @property
@@ -65,11 +243,59 @@ class Remote( object ):
     def __repr__( self ):
         return str( self._remotePopenDetails )
 
-    def _hexedPickle( self ):
-        details = dict( popenDetails = self._remotePopenDetails, port = self._port, uuid = self._uuid )
-        pickled = pickle.dumps( details, protocol = 2 )
+    def _launchPort( self, handshake ):
+        if self._requestedPort is not None:
+            return self._requestedPort
+        if handshake and self._detailsOnStdin:
+            self._port = None
+            return 0
+        random.seed()
+        self._port = random.randint( * PORT_RANGE )
+        return self._port
+
+    def _details( self, handshake ):
+        return dict( popenDetails = self._remotePopenDetails, port = self._launchPort( handshake ), uuid = self._uuid, handshake = handshake, controlBackend = self._controlBackend, grace = self._grace, killer = self._killer, deadManWindow = self._deadManWindow, timeout = self._timeout, controlStream = self._controlStream, offset = self._offset, discard = self._discard, tag = self._tag )
+
+    def _hexedPickle( self, handshake = True ):
+        pickled = pickle.dumps( self._details( handshake ), protocol = 2 )
         return codecs.encode( pickled, 'hex' )
 
+    def _detailsFrame( self, handshake ):
+        return protocol.frame( protocol.DETAILS, pickle.dumps( self._details( handshake ), protocol = DETAILS_PICKLE_PROTOCOL ) )
+
+    def _sendsDetailsOnStdin( self, stdin ):
+        return self._detailsOnStdin and stdin is not None
+
+    def _commandLine( self, closerArguments, handshake, stdin = subprocess.PIPE ):
+        command = self._baseCommand() + closerArguments
+        if self._sendsDetailsOnStdin( stdin ):
+            return command + [ '--details-on-stdin' ]
+        return command + [ self._hexedPickle( handshake = handshake ) ]
+
+    def _popen( self, command, handshake, stdin, kwargs ):
+        if not self._sendsDetailsOnStdin( stdin ):
+            return subprocess.Popen( command, stdin = stdin, ** kwargs )
+        frame = self._detailsFrame( handshake )
+        if stdin == subprocess.PIPE:
+            process = subprocess.Popen( command, stdin = subprocess.PIPE, ** kwargs )
+            stream = getattr( process.stdin, 'buffer', process.stdin )
+            try:
+                stream.write( frame )
+                stream.flush()
+            except BrokenPipeError:
+                pass
+            return process
+        reader, writer = os.pipe()
+        try:
+            process = subprocess.Popen( command, stdin = reader, ** kwargs )
+        except Exception:
+            os.close( writer )
+            raise
+        finally:
+            os.close( reader )
+        channel.feed( writer, frame, stdin )
+        return process
+
     def localProcessKwargs( self, ** kwargs ):
         self._ownKwargs = kwargs
 
@@ -82,20 +308,223 @@ class Remote( object ):
         assert killer in [ 'terminate', 'kill' ]
         self._killer = killer
 
+    @property
+    def gracePeriod( self ):
+        return self._grace
+
+    def setGracePeriod( self, seconds ):
+        self._grace = seconds
+        return self
+
+    def setDeadManSwitch( self, window ):
+        self._deadManSwitch = window
+        return self
+
+    def _armDeadManSwitch( self, cleanup ):
+        window = self._deadManSwitch
+        if window is _AUTOMATIC:
+            window = DEAD_MAN_WINDOW if cleanup else None
+        self._deadManWindow = window if self._detailsOnStdin else None
+
+    def _startHeartbeat( self, fd, writeLock = None ):
+        if self._deadManWindow:
+            return Remote.heartbeat.add( fd, self._deadManWindow / HEARTBEATS_PER_WINDOW, writeLock )
+        return None
+
+    def _journalLaunch( self ):
+        self._journalPending = False
+        if Remote.journal is not None and self._detailsOnStdin:
+            self._journaled = True
+            Remote.journal.launched( self._user, self._host, self._sshPort, self._sshOptions, self._closer, self._port, self._uuid, self._tag )
+
+    def _journalOnHandshake( self, handshake ):
+        if handshake:
+            self._journalPending = Remote.journal is not None and self._detailsOnStdin
+        else:
+            self._journalLaunch()
+
+    def _journalEnd( self ):
+        self._journalPending = False
+        if self._journaled and Remote.journal is not None:
+            self._journaled = False
+            Remote.journal.ended( self._uuid )
+
+    def _watchExit( self, onExit = None ):
+        def exited( exitCode ):
+            if exitCode != SSH_ERROR_EXIT_CODE:
+                self._journalEnd()
+            if onExit is not None:
+                onExit( exitCode )
+        Remote.reactor.watchProcess( self._process, exited )
+
+    def _setDeadline( self, timeout ):
+        self._timeout = timeout if self._detailsOnStdin else None
+        self._deadlineExpired = False
+
+    def _localTimeout( self, timeout ):
+        if self._timeout is None:
+            return timeout
+        grace = containment.GRACE if self._grace is None else self._grace
+        return timeout + grace + containment.CONFIRM_TIMEOUT + DEADLINE_SLACK
+
+    @property
+    def timedOut( self ):
+        if self._timeout is None:
+            return False
+        if self._channel is not None and getattr( self._process, 'returncode', None ) is not None:
+            self._channel.join( OUTCOME_TIMEOUT )
+        return self._deadlineExpired
+
+    def _onOutcome( self, outcome ):
+        self._deadlineExpired = outcome.get( 'timedOut', False )
+
+    def _raiseTimeout( self, timeout ):
+        raise exceptions.RemoteProcessTimeout( 'runtime exceeded {} seconds for remote process: {}'.format( timeout, self ) )
+
+    @property
+    def killReport( self ):
+        return self._killReport
+
+    def _killTimeout( self, timeout ):
+        if timeout is not None:
+            return timeout
+        grace = containment.GRACE if self._grace is None else self._grace
+        connectTimeout, readTimeout = Remote.controlClient.timeout
+        return connectTimeout, readTimeout + grace + containment.CONFIRM_TIMEOUT
+
+    def _sshCommand( self ):
+        command = [ 'ssh', '-o', self._sshOptions, '-p', str( self._sshPort ) ]
+        if Remote.sshPool is not None:
+            command += Remote.sshPool.arguments( self._user, self._host, self._sshPort, self._sshOptions )
+        return command
+
     def _baseCommand( self ):
         logging.debug( 'closer launching remote subprocess: {}'.format( self ) )
-        return [ 'ssh', '-o', self._sshOptions, '-p', str( self._sshPort ), self._sshTarget , self._closer, ]
+        return self._sshCommand() + [ self._sshTarget , self._closer, ]
+
+    def warmUp( self ):
+        if Remote.sshPool is not None:
+            Remote.sshPool.warmUp( self._user, self._host, self._sshPort, self._sshOptions )
+        if Remote.warmPool is not None and self._detailsOnStdin:
+            Remote.warmPool.fill( self._warmCommand() )
+        return self
 
-    def setCloserCommand( self, command ):
+    def setCloserCommand( self, command, detailsOnStdin = None ):
         self._closer = command
+        if detailsOnStdin is None:
+            detailsOnStdin = os.path.basename( command.split()[ -1 ] ) not in LEGACY_CLOSERS
+        self._detailsOnStdin = detailsOnStdin
+        return self
+
+    def useAgent( self, agent ):
+        self._agent = agent
+        return self
+
+    def _refuseAgent( self, method ):
+        if self._agent is not None:
+            raise exceptions.RemoteProcessException( '{}() is not supported for processes launched through a closer agent, use background()'.format( method ) )
+
+    def _unsupported( self, method, instead ):
+        raise exceptions.RemoteProcessException( '{}() is not supported on {}, use {}'.format( method, self, instead ) )
+
+    def _requireDetailsOnStdin( self, method ):
+        if not self._detailsOnStdin:
+            raise exceptions.RemoteProcessException( '{}() needs closer3 reading its launch details from stdin: {}'.format( method, self ) )
+
+    def setControlBackend( self, backend ):
+        assert backend in [ 'stdlib', 'flask', 'ssh' ]
+        self._controlBackend = backend
         return self
 
-    def background( self, cleanup = False ):
-        sshCommand = self._baseCommand() + [ '--quit-when-told', '--killer', self._killer, self._hexedPickle() ]
-        self._process = subprocess.Popen( sshCommand, stdin = subprocess.PIPE, ** self._ownKwargs )
-        find_remote_control_port.FindRemoteControlPort( self )
+    @property
+    def launch( self ):
+        return self._launch
+
+    def _openChannel( self, kwargs ):
+        self._launch = launch.Launch( self )
+        self._channel = None
+        if kwargs.get( 'stderr' ) == subprocess.STDOUT:
+            self._launch._unavailable( 'its stderr is merged into stdout, so closer sends no handshake' )
+            return None
+        self._channel = channel.Channel( self, kwargs.get( 'stderr' ) )
+        kwargs[ 'stderr' ] = self._channel.stderr
+        return self._channel
+
+    def _useControlStream( self, handshake ):
+        self._controlStream = self._controlBackend == 'ssh' and self._detailsOnStdin
+        if self._controlStream and not handshake:
+            raise exceptions.RemoteProcessException( 'the ssh control backend replies over stderr, which cannot be merged into stdout: {}'.format( self ) )
+
+    def _openControlStream( self, fd, writeLock ):
+        if self._controlStream:
+            self._streamControl = stream_control.StreamControlClient( stream_control.pipeWriter( fd, writeLock ) )
+
+    def _shareStdin( self, fd ):
+        writeLock = threading.Lock()
+        self._startHeartbeat( fd, writeLock )
+        self._openControlStream( fd, writeLock )
+
+    def _onControlReply( self, payload ):
+        if self._streamControl is not None:
+            self._streamControl.onReply( payload )
+
+    def _controlStreamClosed( self ):
+        if self._streamControl is not None:
+            self._streamControl.close()
+
+    def _awaitPort( self ):
+        if self._port is not None or self._launch is None:
+            return
+        try:
+            Remote.reactor.wait( self._launch.ready, READY_TIMEOUT )
+        except ( exceptions.RemoteProcessException, concurrent.futures.TimeoutError ) as e:
+            raise requests.exceptions.ConnectionError( 'remote closer never reported its control port: {!r}'.format( e ) )
+
+    def _control( self, path, timeout = None, ** params ):
+        if self._controlBackend != 'ssh':
+            self._awaitPort()
+            return Remote.controlClient.get( self._host, self._port, path, timeout = timeout, params = params or None )
+        if self._streamControl is None:
+            raise requests.exceptions.ConnectionError( 'no ssh control stream to {}, it only exists for background() and liveMonitor()'.format( self ) )
+        return self._streamControl.request( path, timeout = timeout or Remote.controlClient.timeout, wait = Remote.reactor.wait, ** params )
+
+    def _quitWhenToldCommand( self, handshake, stdin = subprocess.PIPE ):
+        return self._commandLine( [ '--quit-when-told', '--killer', self._killer ], handshake, stdin )
+
+    def _handshake( self, handshake ):
+        logging.info( 'remote closer listening on {}:{}'.format( self._host, handshake[ 'port' ] ) )
+        self._port = handshake[ 'port' ]
+        if self._journalPending:
+            self._journalLaunch()
+        self._launch._handshake( handshake )
+
+    def _noHandshake( self ):
+        logging.info( 'no handshake from remote closer for {}'.format( self ) )
+        self._launch._noHandshake()
+
+    def background( self, cleanup = False, timeout = None ):
+        self._setDeadline( timeout )
+        if self._agent is not None:
+            self._launch = self._agent.launchJob( self )
+            if cleanup:
+                Remote._cleanup.append( self )
+            return self._launch
+
+        kwargs = dict( self._ownKwargs )
+        channel_ = self._openChannel( kwargs )
+        self._useControlStream( channel_ is not None )
+        sshCommand = self._quitWhenToldCommand( channel_ is not None )
+        self._armDeadManSwitch( cleanup )
+        self._process = self._popen( sshCommand, channel_ is not None, subprocess.PIPE, kwargs )
+        self._journalOnHandshake( channel_ is not None )
+        if self._journalPending or self._journaled:
+            self._watchExit()
+        self._shareStdin( self._process.stdin.fileno() )
+        if channel_ is not None:
+            channel_.start( Remote.reactor )
         if cleanup:
             Remote._cleanup.append( self )
+        return self._launch
 
     def foreground( self, check = True, binary = False, timeout = None ):
         completedProcess = self.run( binary = binary, timeout = timeout, check = check )
@@ -106,21 +535,52 @@ class Remote( object ):
         return process.stdout
 
     def run( self, binary = False, timeout = None, check = False, ** kwargsForRun ):
-        sshCommand = self._baseCommand() + [ '--quit-when-told', '--killer', self._killer, self._hexedPickle() ]
+        self._refuseAgent( 'run' )
         kwargs = dict( self._ownKwargs )
         kwargs.update( kwargsForRun )
         kwargs[ 'universal_newlines' ] = not binary
+        worker = self._warmWorker( kwargs )
+        if worker is None:
+            channel_ = self._openChannel( kwargs )
+            sshCommand = self._quitWhenToldCommand( channel_ is not None, kwargs.get( 'stdin' ) )
+        else:
+            self._launch = launch.Launch( self )
+            channel_ = worker.attach( self, kwargs.get( 'stderr' ) )
+            sshCommand = worker.command
         try:
-            return self._run( sshCommand, timeout, check, kwargs )
+            return self._run( sshCommand, timeout, check, kwargs, channel_, binary, worker )
         except subprocess.TimeoutExpired:
-            self.terminate()
-            raise exceptions.RemoteProcessTimeout( 'runtime exceeded {} seconds for remote process: {}'.format( timeout, self ) )
+            if self.terminate() is None:
+                self._process.kill()
+            self._raiseTimeout( timeout )
         except subprocess.CalledProcessError as e:
             raise exceptions.RemoteProcessError( self._remotePopenDetails, e )
 
-    def _run( self, sshCommand, timeout, check, kwargs ):
-        self._process = subprocess.Popen( sshCommand, ** kwargs )
-        output, error = self._process.communicate( timeout = timeout )
+    def _run( self, sshCommand, timeout, check, kwargs, channel_, binary, worker = None ):
+        stdin = kwargs.pop( 'stdin', None )
+        self._deadManWindow = None
+        self._controlStream = False
+        self._setDeadline( None if channel_ is None else timeout )
+        localTimeout = None if timeout is None else self._localTimeout( timeout )
+        if channel_ is not None:
+            self._journalOnHandshake( True )
+        if worker is None:
+            self._process = self._popen( sshCommand, channel_ is not None, stdin, kwargs )
+            if channel_ is not None:
+                channel_.start( Remote.reactor )
+            output, error = self._process.communicate( timeout = localTimeout )
+        else:
+            self._process = worker.process
+            output, error = self._process.communicate( input = self._detailsFrame( True ), timeout = localTimeout )
+            output = self._deliverOutput( output, kwargs.get( 'stdout' ), binary )
+        if channel_ is not None:
+            channel_.join()
+            error = channel_.captured( binary )
+        if self._process.returncode != SSH_ERROR_EXIT_CODE:
+            self._journalEnd()
+        if self.timedOut:
+            self._terminated = True
+            self._raiseTimeout( timeout )
         if check:
             if self._process.returncode != 0:
                 raise subprocess.CalledProcessError( self._process.returncode,
@@ -134,29 +594,174 @@ class Remote( object ):
                                             stderr = error )
         return self._process
 
-    def liveMonitor( self, onOutput, onProcessEnd = None, cleanup = False ):
-        sshCommand = self._baseCommand() + [ '--quit-when-told', '--killer', self._killer, self._hexedPickle() ]
-        self._process = pimped_subprocess.PimpedSubprocess( sshCommand, stdin = subprocess.PIPE, ** self._ownKwargs )
-        self._process.onOutput( onOutput )
-        if onProcessEnd is not None:
-            self._process.onProcessEnd( onProcessEnd )
-        self._process.launch()
+    def _warmCommand( self ):
+        return self._sshCommand() + [ self._sshTarget, self._closer, '--quit-when-told', '--details-on-stdin' ]
+
+    def _warmWorker( self, kwargs ):
+        if Remote.warmPool is None or self._ownKwargs or not self._detailsOnStdin:
+            return None
+        if set( kwargs ) - { 'stdin', 'stdout', 'stderr', 'universal_newlines' }:
+            return None
+        if kwargs.get( 'stdin' ) not in ( None, subprocess.DEVNULL ):
+            return None
+        if any( kwargs.get( stream ) not in ( None, subprocess.PIPE, subprocess.DEVNULL ) for stream in [ 'stdout', 'stderr' ] ):
+            return None
+        return Remote.warmPool.acquire( self._warmCommand() )
+
+    def _deliverOutput( self, output, stdout, binary ):
+        if stdout is None:
+            stream = getattr( sys.stdout, 'buffer', None )
+            if stream is None:
+                sys.stdout.write( channel.decode( output ) )
+            else:
+                stream.write( output )
+            sys.stdout.flush()
+        if stdout != subprocess.PIPE:
+            return None
+        if binary:
+            return output
+        return channel.decode( output )
+
+    def liveMonitor( self, onOutput, onProcessEnd = None, cleanup = False, timeout = None ):
+        self._refuseAgent( 'liveMonitor' )
+        self._setDeadline( timeout )
+        kwargs = dict( self._ownKwargs )
+        kwargs.pop( 'stdout', None )
+        channel_ = self._openChannel( kwargs )
+        self._useControlStream( channel_ is not None )
+        sshCommand = self._quitWhenToldCommand( channel_ is not None )
+        self._armDeadManSwitch( cleanup )
+        reader, writer = os.pipe()
+        try:
+            self._process = self._popen( sshCommand, channel_ is not None, subprocess.PIPE, dict( kwargs, stdout = writer ) )
+        finally:
+            os.close( writer )
+        self._journalOnHandshake( channel_ is not None )
+        self._shareStdin( self._process.stdin.fileno() )
+        monitor = reactor.ProcessMonitor( onOutput, onProcessEnd, Remote.reactor.serial() )
+        Remote.reactor.addLines( reader, monitor.onLine, monitor.onEOF )
+        self._watchExit( monitor.onExit )
+        if channel_ is not None:
+            channel_.start( Remote.reactor )
         if cleanup:
             Remote._cleanup.append( self )
+        return self._launch
+
+    def detach( self, timeout = None ):
+        self._refuseAgent( 'detach' )
+        self._requireDetailsOnStdin( 'detach' )
+        self._setDeadline( timeout )
+        self._deadManWindow = None
+        sshCommand = self._commandLine( [ '--detach', '--killer', self._killer ], True )
+        self._journalLaunch()
+        process = self._popen( sshCommand, True, subprocess.PIPE, dict( self._ownKwargs, stdout = subprocess.PIPE, stderr = subprocess.PIPE ) )
+        try:
+            _, error = process.communicate( timeout = READY_TIMEOUT )
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+            raise exceptions.RemoteProcessException( 'remote closer did not detach {} within {} seconds'.format( self, READY_TIMEOUT ) )
+        for line in error.splitlines( True ):
+            handshake = protocol.parseHandshake( line )
+            if handshake is not None:
+                logging.info( 'detached {} as job {}, spooling its output to {}'.format( self, self._uuid, handshake[ 'spool' ] ) )
+                return self._uuid
+        self._journalEnd()
+        raise exceptions.RemoteProcessException( 'remote closer failed to detach {}: {}'.format( self, error.decode( errors = 'replace' ).strip() ) )
+
+    def reattach( self, onOutput, onProcessEnd = None, offset = 0, discard = False ):
+        self._refuseAgent( 'reattach' )
+        self._requireDetailsOnStdin( 'reattach' )
+        self._offset = offset
+        self._discard = discard
+        kwargs = dict( self._ownKwargs )
+        kwargs.pop( 'stdout', None )
+        channel_ = self._openChannel( kwargs )
+        sshCommand = self._commandLine( [ '--reattach' ], channel_ is not None )
+        reader, writer = os.pipe()
+        try:
+            self._process = self._popen( sshCommand, channel_ is not None, subprocess.DEVNULL, dict( kwargs, stdout = writer ) )
+        finally:
+            os.close( writer )
+        monitor = reactor.ProcessMonitor( onOutput, onProcessEnd, Remote.reactor.serial() )
+        Remote.reactor.addLines( reader, lambda line: self._onSpooledLine( line, monitor ), monitor.onEOF )
+        Remote.reactor.watchProcess( self._process, monitor.onExit )
+        if channel_ is not None:
+            channel_.start( Remote.reactor )
+        return self._launch
+
+    def _onSpooledLine( self, line, monitor ):
+        self._offset += len( line )
+        monitor.onLine( line )
+
+    def _closerQuery( self, method, closerArguments, timeout ):
+        self._requireDetailsOnStdin( method )
+        command = self._sshCommand() + [ self._sshTarget, self._closer ] + closerArguments
+        try:
+            completedProcess = subprocess.run( command, stdin = subprocess.DEVNULL, stdout = subprocess.PIPE, stderr = subprocess.PIPE, timeout = timeout )
+        except subprocess.TimeoutExpired:
+            raise exceptions.RemoteProcessTimeout( 'no answer from closer on {} within {} seconds: {}'.format( self._host, timeout, closerArguments ) )
+        if completedProcess.returncode != 0:
+            raise exceptions.RemoteProcessException( 'closer on {} failed {}: {}'.format( self._host, closerArguments, completedProcess.stderr.decode( errors = 'replace' ).strip() ) )
+        return completedProcess.stdout.decode()
+
+    @staticmethod
+    def _jobFilter( tag, uuids ):
+        arguments = []
+        if tag is not None:
+            arguments += [ '--tag', tag ]
+        for uuid_ in uuids or []:
+            arguments += [ '--uuid', uuid_ ]
+        return arguments
+
+    def listJobs( self, tag = None, timeout = READY_TIMEOUT ):
+        return json.loads( self._closerQuery( 'listJobs', [ '--jobs' ] + self._jobFilter( tag, None ), timeout ) )
+
+    def killJobs( self, tag = None, uuids = None, timeout = READY_TIMEOUT ):
+        if tag is None and not uuids:
+            raise exceptions.RemoteProcessException( 'killJobs() needs a tag or job uuids, refusing to kill every job on {}'.format( self._host ) )
+        return JobsKillReport.parse( self._closerQuery( 'killJobs', [ '--kill-jobs' ] + self._jobFilter( tag, uuids ), timeout ) )
 
     @property
     def process( self ):
         return self._process
 
-    def terminate( self ):
+    def ping( self, timeout = None ):
+        try:
+            return self._control( '/ping', timeout = timeout ) == self._uuid
+        except requests.exceptions.RequestException as e:
+            logging.info( 'while pinging {}'.format( e ) )
+            return False
+
+    def _kill( self, timeout ):
+        timeout = self._killTimeout( timeout )
+        if self._agent is not None:
+            response = self._agent.killJob( self._uuid, timeout = timeout )
+        else:
+            response = self._control( '/kill', timeout = timeout )
+        self._killReport = None if response is None else KillReport.parse( response )
+        self._terminated = True
+        self._journalEnd()
+        return self._killReport
+
+    def signal( self, signalNumber, timeout = None ):
+        if self._agent is not None:
+            return self._agent.signalJob( self._uuid, signalNumber, timeout = timeout )
+        return self._control( '/signal', timeout = timeout, number = signalNumber )
+
+    def status( self, timeout = None ):
+        if self._agent is not None:
+            return self._agent.status( timeout, uuid = self._uuid ).get( self._uuid )
+        return json.loads( self._control( '/status', timeout = timeout ) )
+
+    def terminate( self, timeout = None ):
         try:
             logging.info( 'terminating {}'.format( self ) )
             if self._terminated:
-                return
-            url = 'http://{}:{}/kill'.format( self._host, self._port )
-            requests.get( url )
-            self._terminated = True
+                return self._killReport
+            return self._kill( timeout )
         except requests.exceptions.RequestException as e:
             logging.error( 'exception {} happened while killing {}. This may not be a problem if the process already died on the remote side'.format( e, self ) )
+            return None
 
 atexit.register( Remote.tidyUp )
@@ -0,0 +1,87 @@
+import concurrent.futures
+import subprocess
+import time
+from closer import remote
+
+CONCURRENCY = 64
+
+class HostResult( object ):
+    def __init__( self, remote_, elapsed, exitCode = None, stdout = None, stderr = None, launch = None, error = None ):
+        self.remote = remote_
+        self.elapsed = elapsed
+        self.exitCode = exitCode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.launch = launch
+        self.error = error
+
+    @property
+    def host( self ):
+        return self.remote.host
+
+    @property
+    def ok( self ):
+        return self.error is None and self.exitCode in ( None, 0 )
+
+    def __repr__( self ):
+        return 'HostResult( host = {}, exitCode = {}, elapsed = {:.3f}, error = {!r} )'.format( self.host, self.exitCode, self.elapsed, self.error )
+
+class RemoteGroup( object ):
+    def __init__( self, user, hosts, * popenArgs, ** popenKwargs ):
+        self._remotes = [ remote.Remote( user, host, * popenArgs, ** popenKwargs ) for host in hosts ]
+        self._concurrency = CONCURRENCY
+
+    @property
+    def remotes( self ):
+        return list( self._remotes )
+
+    def setConcurrency( self, concurrency ):
+        assert concurrency > 0
+        self._concurrency = concurrency
+        return self
+
+    def configure( self, function ):
+        for remote_ in self._remotes:
+            function( remote_ )
+        return self
+
+    def run( self, binary = False, timeout = None, check = False, ** kwargsForRun ):
+        def runOne( remote_ ):
+            completedProcess = remote_.run( binary = binary, timeout = timeout, check = check, ** kwargsForRun )
+            return dict( exitCode = completedProcess.returncode, stdout = completedProcess.stdout, stderr = completedProcess.stderr )
+        return self._fanOut( runOne, self._remotes )
+
+    def output( self, binary = False, check = True, timeout = None ):
+        return self.run( binary = binary, timeout = timeout, check = check, stdout = subprocess.PIPE )
+
+    def background( self, cleanup = False, timeout = None, readyTimeout = None ):
+        def backgroundOne( remote_ ):
+            launch = remote_.background( cleanup = cleanup, timeout = timeout )
+            launch.wait( readyTimeout )
+            return dict( launch = launch )
+        return self._fanOut( backgroundOne, self._remotes )
+
+    def terminate( self, timeout = None ):
+        def terminateOne( remote_ ):
+            if not remote_._terminated:
+                remote_._kill( timeout )
+            return {}
+        return self._fanOut( terminateOne, self._remotes )
+
+    def _fanOut( self, function, remotes ):
+        executor = concurrent.futures.ThreadPoolExecutor( max_workers = max( 1, min( self._concurrency, len( remotes ) ) ) )
+        futures = [ executor.submit( self._timed, function, remote_ ) for remote_ in remotes ]
+        executor.shutdown( wait = False )
+        return self._asCompleted( futures )
+
+    def _asCompleted( self, futures ):
+        for future in concurrent.futures.as_completed( futures ):
+            yield future.result()
+
+    def _timed( self, function, remote_ ):
+        start = time.monotonic()
+        try:
+            fields = function( remote_ )
+        except Exception as e:
+            fields = dict( error = e, exitCode = getattr( e, 'exitCode', None ) )
+        return HostResult( remote_, time.monotonic() - start, ** fields )
@@ -0,0 +1,163 @@
+import concurrent.futures
+import itertools
+import os
+import pickle
+import subprocess
+import threading
+from closer import channel
+from closer import exceptions
+from closer import protocol
+from closer import remote
+
+CLOSE_TIMEOUT = 30
+
+class RemoteSession( remote.Remote ):
+    def __init__( self, user, host ):
+        remote.Remote.__init__( self, user, host )
+        self._ids = itertools.count( 1 )
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._writeLock = threading.Lock()
+        self._decoder = protocol.FrameDecoder()
+        self._heartbeatFd = None
+        self._ended = False
+        self._callbacks = remote.Remote.reactor.serial()
+
+    def __repr__( self ):
+        return 'closer session on {}'.format( self._sshTarget )
+
+    def start( self, cleanup = False ):
+        if not self._detailsOnStdin:
+            raise exceptions.RemoteProcessException( 'sessions need closer3 reading its launch details from stdin: {}'.format( self ) )
+        sshCommand = self._commandLine( [ '--session' ], False )
+        self._armDeadManSwitch( cleanup )
+        reader, writer = os.pipe()
+        try:
+            self._process = self._popen( sshCommand, False, subprocess.PIPE, dict( self._ownKwargs, stdout = writer ) )
+        finally:
+            os.close( writer )
+        self._heartbeatFd = self._startHeartbeat( self._process.stdin.fileno(), self._writeLock )
+        remote.Remote.reactor.addStream( reader, self._onData, self._onEOF )
+        if cleanup:
+            remote.Remote._cleanup.append( self )
+        return self
+
+    def submit( self, * popenArgs, timeout = None, ** popenKwargs ):
+        future = concurrent.futures.Future()
+        with self._lock:
+            if self._ended:
+                raise exceptions.RemoteProcessException( 'session has ended: {}'.format( self ) )
+            id_ = next( self._ids )
+            self._pending[ id_ ] = ( future, popenArgs[ 0 ] if popenArgs else popenKwargs.get( 'args' ) )
+        command = dict( id = id_, args = popenArgs, kwargs = popenKwargs, timeout = timeout )
+        self._send( pickle.dumps( command, protocol = remote.DETAILS_PICKLE_PROTOCOL ) )
+        return future
+
+    def run( self, * popenArgs, binary = False, timeout = None, check = False, ** popenKwargs ):
+        completedProcess = self._decode( self.submit( * popenArgs, timeout = timeout, ** popenKwargs ).result(), binary )
+        self._check( completedProcess, popenArgs, popenKwargs, timeout, check )
+        return completedProcess
+
+    def output( self, * popenArgs, binary = False, check = True, timeout = None, ** popenKwargs ):
+        return self.run( * popenArgs, binary = binary, timeout = timeout, check = check, ** popenKwargs ).stdout
+
+    def foreground( self, * popenArgs, check = True, binary = False, timeout = None, ** popenKwargs ):
+        return self.run( * popenArgs, binary = binary, timeout = timeout, check = check, ** popenKwargs ).returncode
+
+    def background( self, cleanup = False, timeout = None ):
+        self._unsupported( 'background', 'start() and submit()' )
+
+    def liveMonitor( self, onOutput, onProcessEnd = None, cleanup = False, timeout = None ):
+        self._unsupported( 'liveMonitor', 'submit()' )
+
+    def detach( self, timeout = None ):
+        self._unsupported( 'detach', 'a Remote' )
+
+    def reattach( self, onOutput, onProcessEnd = None, offset = 0, discard = False ):
+        self._unsupported( 'reattach', 'a Remote' )
+
+    def useAgent( self, agent ):
+        self._unsupported( 'useAgent', 'a Remote' )
+
+    def ping( self, timeout = None ):
+        self._unsupported( 'ping', 'a Remote' )
+
+    def signal( self, signalNumber, timeout = None ):
+        self._unsupported( 'signal', 'terminate()' )
+
+    def status( self, timeout = None ):
+        self._unsupported( 'status', 'submit() futures' )
+
+    def runMany( self, commands, binary = False, timeout = None, ** popenKwargs ):
+        futures = [ self.submit( command, timeout = timeout, ** popenKwargs ) for command in commands ]
+        for future in futures:
+            yield self._decode( future.result(), binary )
+
+    def _decode( self, completedProcess, binary ):
+        if not binary:
+            completedProcess.stdout = channel.decode( completedProcess.stdout )
+            completedProcess.stderr = channel.decode( completedProcess.stderr )
+        return completedProcess
+
+    def _check( self, completedProcess, popenArgs, popenKwargs, timeout, check ):
+        popenDetails = dict( args = popenArgs, kwargs = popenKwargs )
+        if completedProcess.timedOut:
+            raise exceptions.RemoteProcessTimeout( 'runtime exceeded {} seconds for remote process: {}'.format( timeout, popenDetails ) )
+        if check and completedProcess.returncode != 0:
+            calledProcessError = subprocess.CalledProcessError( completedProcess.returncode, completedProcess.args, output = completedProcess.stdout, stderr = completedProcess.stderr )
+            raise exceptions.RemoteProcessError( popenDetails, calledProcessError )
+
+    def _send( self, payload ):
+        with self._writeLock:
+            try:
+                protocol.writeFrame( self._process.stdin.fileno(), protocol.COMMAND, payload )
+            except OSError as e:
+                raise exceptions.RemoteProcessException( 'session {} is gone: {}'.format( self, e ) )
+
+    def _onData( self, data ):
+        for kind, payload in self._decoder.feed( data ):
+            if kind != protocol.RESULT:
+                continue
+            id_, returncode, timedOut, stdout, stderr = protocol.parseResult( payload )
+            with self._lock:
+                future, args = self._pending.pop( id_ )
+            completedProcess = subprocess.CompletedProcess( args, returncode, stdout = stdout, stderr = stderr )
+            completedProcess.timedOut = timedOut
+            self._callbacks.call( future.set_result, completedProcess )
+
+    def _onEOF( self ):
+        with self._lock:
+            self._ended = True
+            pending = list( self._pending.values() )
+            self._pending.clear()
+        for future, args in pending:
+            self._callbacks.call( future.set_exception, exceptions.RemoteProcessException( 'session {} ended before {} finished'.format( self, args ) ) )
+
+    def _closeInput( self ):
+        if self._heartbeatFd is not None:
+            remote.Remote.heartbeat.remove( self._heartbeatFd )
+            self._heartbeatFd = None
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+
+    def close( self, timeout = CLOSE_TIMEOUT ):
+        with self._lock:
+            self._ended = True
+        try:
+            self._send( b'' )
+        except exceptions.RemoteProcessException:
+            pass
+        self._closeInput()
+        self._process.wait( timeout )
+        self._terminated = True
+
+    def _kill( self, timeout ):
+        self._closeInput()
+        try:
+            self._process.wait( CLOSE_TIMEOUT if timeout is None else timeout )
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+        self._terminated = True
+        return None
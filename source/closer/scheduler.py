@@ -0,0 +1,171 @@
+import collections
+import concurrent.futures
+import heapq
+import itertools
+import logging
+import threading
+from closer import exceptions
+from closer import remote
+
+PER_HOST = 8
+TOTAL = 256
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+
+class Job( object ):
+    def __init__( self, remote_, priority, cleanup ):
+        self._remote = remote_
+        self._priority = priority
+        self._cleanup = cleanup
+        self._state = QUEUED
+        self._finished = concurrent.futures.Future()
+
+    @property
+    def remote( self ):
+        return self._remote
+
+    @property
+    def host( self ):
+        return self._remote.host
+
+    @property
+    def priority( self ):
+        return self._priority
+
+    @property
+    def state( self ):
+        return self._state
+
+    @property
+    def finished( self ):
+        return self._finished
+
+    def wait( self, timeout = None ):
+        return self._finished.result( timeout )
+
+    def __repr__( self ):
+        return 'Job( host = {}, priority = {}, state = {}, remote = {} )'.format( self.host, self._priority, self._state, self._remote )
+
+class Scheduler( object ):
+    def __init__( self, perHost = PER_HOST, total = TOTAL ):
+        self._perHost = perHost
+        self._total = total
+        self._hostLimits = {}
+        self._lock = threading.Lock()
+        self._queues = collections.defaultdict( list )
+        self._running = collections.Counter()
+        self._runningTotal = 0
+        self._sequence = itertools.count()
+        self._unfinished = set()
+
+    def setHostLimit( self, host, limit ):
+        with self._lock:
+            self._hostLimits[ host ] = limit
+        self._dispatch()
+        return self
+
+    def _hostLimit( self, host ):
+        return self._hostLimits.get( host, self._perHost )
+
+    def submit( self, remote_, priority = 0, cleanup = False ):
+        if remote_._agent is not None:
+            raise exceptions.RemoteProcessException( 'the scheduler cannot track processes launched through a closer agent: {}'.format( remote_ ) )
+        job = Job( remote_, priority, cleanup )
+        with self._lock:
+            heapq.heappush( self._queues[ remote_.host ], ( - priority, next( self._sequence ), job ) )
+            self._unfinished.add( job )
+        self._dispatch()
+        return job
+
+    def cancel( self, jobs = None, host = None ):
+        cancelled = []
+        if jobs is not None:
+            jobs = set( jobs )
+        with self._lock:
+            for queueHost, queue in self._queues.items():
+                if host is not None and queueHost != host:
+                    continue
+                kept = []
+                for entry in queue:
+                    job = entry[ 2 ]
+                    if jobs is None or job in jobs:
+                        job._state = CANCELLED
+                        cancelled.append( job )
+                    else:
+                        kept.append( entry )
+                heapq.heapify( kept )
+                queue[ : ] = kept
+            self._unfinished.difference_update( cancelled )
+        for job in cancelled:
+            job._finished.cancel()
+        return cancelled
+
+    def queued( self, host = None ):
+        with self._lock:
+            if host is not None:
+                return len( self._queues.get( host, () ) )
+            return sum( len( queue ) for queue in self._queues.values() )
+
+    def running( self, host = None ):
+        with self._lock:
+            if host is not None:
+                return self._running[ host ]
+            return self._runningTotal
+
+    def wait( self, timeout = None ):
+        with self._lock:
+            futures = [ job._finished for job in self._unfinished ]
+        concurrent.futures.wait( futures, timeout )
+
+    def _dispatch( self ):
+        while True:
+            with self._lock:
+                job = self._next()
+                if job is None:
+                    return
+                job._state = RUNNING
+                self._running[ job.host ] += 1
+                self._runningTotal += 1
+            if not self._start( job ):
+                self._finish( job, FAILED )
+
+    def _next( self ):
+        if self._runningTotal >= self._total:
+            return None
+        best = None
+        for host, queue in self._queues.items():
+            if not queue or self._running[ host ] >= self._hostLimit( host ):
+                continue
+            if best is None or queue[ 0 ] < best[ 0 ]:
+                best = ( queue[ 0 ], host )
+        if best is None:
+            return None
+        _, host = best
+        return heapq.heappop( self._queues[ host ] )[ 2 ]
+
+    def _start( self, job ):
+        try:
+            job._remote.background( cleanup = job._cleanup )
+        except Exception as e:
+            logging.error( 'scheduler failed to launch {}: {}'.format( job, e ) )
+            job._finished.set_exception( e )
+            return False
+        callbacks = remote.Remote.reactor.serial()
+        remote.Remote.reactor.watchProcess( job._remote.process, lambda exitCode: callbacks.call( self._exited, job, exitCode ) )
+        return True
+
+    def _exited( self, job, exitCode ):
+        self._finish( job, DONE )
+        job._finished.set_result( exitCode )
+        self._dispatch()
+
+    def _finish( self, job, state ):
+        with self._lock:
+            job._state = state
+            self._running[ job.host ] -= 1
+            self._runningTotal -= 1
+            self._unfinished.discard( job )
@@ -0,0 +1,86 @@
+import os
+import pickle
+import queue
+import signal
+import subprocess
+import threading
+from closer import closer3
+from closer import containment
+from closer import protocol
+
+SPAWN_FAILED = 127
+
+class SessionServer( object ):
+    def __init__( self, details ):
+        self._killer = details.get( 'killer' ) or 'terminate'
+        self._grace = containment.GRACE if details.get( 'grace' ) is None else details[ 'grace' ]
+        self._window = details.get( 'deadManWindow' )
+        self._commands = queue.Queue()
+        self._lock = threading.Lock()
+        self._current = None
+        self._lost = False
+        self._ending = False
+        self._output = os.dup( 1 )
+        os.dup2( 2, 1 )
+
+    def run( self ):
+        containment.becomeSubreaper()
+        closer3.watchController( self._window, self._onLost, { protocol.COMMAND: self._onCommand }, onEOF = self._onLost )
+        signal.signal( signal.SIGTERM, lambda * args: self._abort() )
+        signal.signal( signal.SIGHUP, lambda * args: self._onLost() )
+        while True:
+            payload = self._commands.get()
+            if not payload or self._lost:
+                return
+            command = pickle.loads( payload )
+            protocol.writeFrame( self._output, protocol.RESULT, self._execute( command ) )
+
+    def _execute( self, command ):
+        kwargs = dict( command[ 'kwargs' ] )
+        kwargs.setdefault( 'stdin', subprocess.DEVNULL )
+        kwargs.setdefault( 'stdout', subprocess.PIPE )
+        kwargs.setdefault( 'stderr', subprocess.PIPE )
+        containment_ = containment.Containment()
+        try:
+            process = subprocess.Popen( * command[ 'args' ], ** containment_.popenKwargs( kwargs ) )
+        except OSError as e:
+            return protocol.result( command[ 'id' ], SPAWN_FAILED, b'', str( e ).encode() )
+        containment_.started( process.pid )
+        with self._lock:
+            self._current = ( process, containment_ )
+        if self._lost:
+            self._kill()
+        timedOut = False
+        try:
+            stdout, stderr = process.communicate( timeout = command.get( 'timeout' ) )
+        except subprocess.TimeoutExpired:
+            timedOut = True
+            containment_.kill( self._killer, root = process.pid, grace = self._grace )
+            stdout, stderr = process.communicate()
+        with self._lock:
+            self._current = None
+        if containment_.occupied( os.getpid() ):
+            containment_.kill( self._killer, root = os.getpid(), grace = self._grace )
+        containment.reapAll()
+        return protocol.result( command[ 'id' ], process.returncode, stdout or b'', stderr or b'', timedOut )
+
+    def _kill( self ):
+        with self._lock:
+            current = self._current
+        if current is not None:
+            process, containment_ = current
+            containment_.kill( self._killer, root = process.pid, grace = self._grace )
+
+    def _onCommand( self, payload ):
+        if not payload:
+            self._ending = True
+        self._commands.put( payload )
+
+    def _onLost( self ):
+        if not self._ending:
+            self._abort()
+
+    def _abort( self ):
+        self._lost = True
+        self._commands.put( b'' )
+        self._kill()
@@ -0,0 +1,54 @@
+import os
+import shutil
+import time
+
+DIRECTORY = os.path.join( '~', '.closer', 'spool' )
+OUTPUT = 'output'
+RETURNCODE = 'returncode'
+CHUNK = 65536
+POLL_INTERVAL = 0.2
+
+def directory( uuid ):
+    if not uuid or os.path.basename( uuid ) != uuid or uuid.startswith( '.' ):
+        raise ValueError( 'not a closer job uuid: {!r}'.format( uuid ) )
+    return os.path.join( os.path.expanduser( DIRECTORY ), uuid )
+
+def exists( uuid ):
+    return os.path.exists( os.path.join( directory( uuid ), OUTPUT ) )
+
+def create( uuid ):
+    path = directory( uuid )
+    os.makedirs( path, mode = 0o700, exist_ok = True )
+    return os.open( os.path.join( path, OUTPUT ), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600 )
+
+def finish( uuid, returncode ):
+    path = os.path.join( directory( uuid ), RETURNCODE )
+    temporary = path + '.tmp'
+    with open( temporary, 'w' ) as file:
+        file.write( str( returncode ) )
+    os.rename( temporary, path )
+
+def returncode( uuid ):
+    try:
+        with open( os.path.join( directory( uuid ), RETURNCODE ) ) as file:
+            return int( file.read() )
+    except FileNotFoundError:
+        return None
+
+def discard( uuid ):
+    shutil.rmtree( directory( uuid ), ignore_errors = True )
+
+def follow( uuid, offset, write ):
+    with open( os.path.join( directory( uuid ), OUTPUT ), 'rb' ) as source:
+        source.seek( offset )
+        while True:
+            exitCode = returncode( uuid )
+            data = source.read( CHUNK )
+            if data:
+                write( data )
+                continue
+            if exitCode is not None:
+                return exitCode
+            if not exists( uuid ):
+                raise FileNotFoundError( 'spool of closer job {} was removed'.format( uuid ) )
+            time.sleep( POLL_INTERVAL )
@@ -0,0 +1,75 @@
+import hashlib
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+
+MAX_IDLE = 300
+
+class SSHPool( object ):
+    def __init__( self, maxIdle = MAX_IDLE, directory = None ):
+        self._maxIdle = maxIdle
+        self._directory = directory
+        self._lock = threading.Lock()
+        self._known = {}
+
+    @property
+    def maxIdle( self ):
+        return self._maxIdle
+
+    def _socketDirectory( self ):
+        if self._directory is None:
+            self._directory = os.path.join( tempfile.gettempdir(), 'closer-ssh-{}'.format( os.getuid() ) )
+        os.makedirs( self._directory, mode = 0o700, exist_ok = True )
+        if os.stat( self._directory ).st_uid != os.getuid():
+            raise PermissionError( 'ssh control socket directory {} is not owned by us'.format( self._directory ) )
+        return self._directory
+
+    def controlPath( self, user, host, port, options = '' ):
+        key = '{}@{}:{} {}'.format( user, host, port, _normalized( options ) )
+        digest = hashlib.sha1( key.encode() ).hexdigest()[ : 16 ]
+        return os.path.join( self._socketDirectory(), digest )
+
+    def arguments( self, user, host, port, options = '' ):
+        controlPath = self.controlPath( user, host, port, options )
+        with self._lock:
+            self._known[ ( user, host, port, _normalized( options ) ) ] = controlPath
+        return [ '-o', 'ControlMaster=auto',
+                 '-o', 'ControlPath={}'.format( controlPath ),
+                 '-o', 'ControlPersist={}'.format( self._maxIdle ) ]
+
+    def _target( self, user, host, port ):
+        return [ '-p', str( port ), '{}@{}'.format( user, host ) ]
+
+    def alive( self, user, host, port = 22, options = '' ):
+        command = [ 'ssh', '-o', 'ControlPath={}'.format( self.controlPath( user, host, port, options ) ), '-O', 'check' ] + self._target( user, host, port )
+        completed = subprocess.run( command, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL )
+        return completed.returncode == 0
+
+    def warmUp( self, user, host, port = 22, options = '' ):
+        if self.alive( user, host, port, options ):
+            return
+        extraArguments = [ '-o', options ] if _normalized( options ) else []
+        command = [ 'ssh' ] + extraArguments + self.arguments( user, host, port, options ) + [ '-N', '-f' ] + self._target( user, host, port )
+        logging.info( 'closer warming up ssh connection to {}@{}:{}'.format( user, host, port ) )
+        subprocess.run( command, stdin = subprocess.DEVNULL, stdout = subprocess.DEVNULL, check = True )
+
+    def close( self, user, host, port = 22, options = None ):
+        with self._lock:
+            keys = [ key for key in self._known if key[ : 3 ] == ( user, host, port ) and ( options is None or key[ 3 ] == _normalized( options ) ) ]
+            controlPaths = [ self._known.pop( key ) for key in keys ]
+        if not controlPaths:
+            controlPaths = [ self.controlPath( user, host, port, options or '' ) ]
+        for controlPath in controlPaths:
+            command = [ 'ssh', '-o', 'ControlPath={}'.format( controlPath ), '-O', 'exit' ] + self._target( user, host, port )
+            subprocess.run( command, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL )
+
+    def closeAll( self ):
+        with self._lock:
+            known = list( self._known )
+        for user, host, port, options in known:
+            self.close( user, host, port, options )
+
+def _normalized( options ):
+    return ' '.join( ( options or '' ).split() )
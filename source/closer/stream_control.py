@@ -0,0 +1,166 @@
+import itertools
+import json
+import os
+import threading
+from closer import protocol
+
+CHUNK = 65536
+FLUSH_TIMEOUT = 1
+
+def _futures():
+    import concurrent.futures
+    return concurrent.futures
+
+def _requestsExceptions():
+    import requests.exceptions
+    return requests.exceptions
+
+def pipeWriter( fd, writeLock ):
+    def write( data ):
+        with writeLock:
+            while data:
+                data = data[ os.write( fd, data ) : ]
+    return write
+
+class StreamControlClient( object ):
+    def __init__( self, write ):
+        self._write = write
+        self._ids = itertools.count( 1 )
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def send( self, path, ** params ):
+        future = _futures().Future()
+        with self._lock:
+            if self._closed:
+                future.set_exception( _requestsExceptions().ConnectionError( 'closer control stream is closed' ) )
+                return future
+            id_ = next( self._ids )
+            self._pending[ id_ ] = future
+        request = json.dumps( dict( id = id_, path = path, params = params ) ).encode()
+        try:
+            self._write( protocol.frame( protocol.CONTROL, request ) )
+        except OSError as e:
+            with self._lock:
+                self._pending.pop( id_, None )
+            future.set_exception( _requestsExceptions().ConnectionError( 'cannot write closer control request {}: {}'.format( path, e ) ) )
+        return future
+
+    def request( self, path, timeout = None, wait = None, ** params ):
+        if isinstance( timeout, tuple ):
+            timeout = sum( timeout )
+        future = self.send( path, ** params )
+        try:
+            if wait is not None:
+                return wait( future, timeout )
+            return future.result( timeout )
+        except _futures().TimeoutError:
+            raise _requestsExceptions().Timeout( 'no reply to closer control request {} within {} seconds'.format( path, timeout ) )
+
+    def onReply( self, payload ):
+        reply = json.loads( payload.decode() )
+        with self._lock:
+            future = self._pending.pop( reply[ 'id' ], None )
+        if future is None:
+            return
+        if reply[ 'status' ] != 200:
+            future.set_exception( _requestsExceptions().HTTPError( 'closer control request failed with {}: {}'.format( reply[ 'status' ], reply[ 'body' ] ) ) )
+            return
+        future.set_result( reply[ 'body' ] )
+
+    def close( self ):
+        with self._lock:
+            self._closed = True
+            pending = list( self._pending.values() )
+            self._pending.clear()
+        for future in pending:
+            future.set_exception( _requestsExceptions().ConnectionError( 'closer control stream closed before a reply arrived' ) )
+
+class FramedStandardError( object ):
+    def __init__( self ):
+        self._fd = os.dup( 2 )
+        self._relayReader, writer = os.pipe()
+        os.dup2( writer, 2 )
+        os.close( writer )
+        self._relay = None
+        self._writeLock = threading.Lock()
+
+    def announce( self, ** fields ):
+        try:
+            os.write( self._fd, protocol.handshakeLine( framed = True, ** fields ) )
+        except OSError:
+            pass
+        self._relay = threading.Thread( target = self._relayStandardError )
+        self._relay.daemon = True
+        self._relay.start()
+
+    def _send( self, kind, payload ):
+        with self._writeLock:
+            try:
+                protocol.writeFrame( self._fd, kind, payload )
+            except OSError:
+                pass
+
+    def _relayStandardError( self ):
+        while True:
+            try:
+                data = os.read( self._relayReader, CHUNK )
+            except OSError:
+                return
+            if not data:
+                return
+            self._send( protocol.STDERR, data )
+
+    def close( self, ** outcome ):
+        devnull = os.open( os.devnull, os.O_WRONLY )
+        os.dup2( devnull, 2 )
+        os.close( devnull )
+        if self._relay is not None:
+            self._relay.join( FLUSH_TIMEOUT )
+        self._send( protocol.OUTCOME, json.dumps( outcome ).encode() )
+
+class StreamControlServer( FramedStandardError ):
+    def __init__( self, routes ):
+        FramedStandardError.__init__( self )
+        self.routes = routes
+        self._lock = threading.Lock()
+        self._inFlight = 0
+        self._stopping = False
+        self._stopped = threading.Event()
+
+    def handle( self, payload ):
+        with self._lock:
+            self._inFlight += 1
+        thread = threading.Thread( target = self._serve, args = ( payload, ) )
+        thread.daemon = True
+        thread.start()
+
+    def _serve( self, payload ):
+        try:
+            request = json.loads( payload.decode() )
+            status, body = self._dispatch( request[ 'path' ], request.get( 'params', {} ) )
+            self._send( protocol.REPLY, json.dumps( dict( id = request[ 'id' ], status = status, body = body ) ).encode() )
+        finally:
+            with self._lock:
+                self._inFlight -= 1
+                if self._stopping and not self._inFlight:
+                    self._stopped.set()
+
+    def _dispatch( self, path, params ):
+        route = self.routes.get( path )
+        if route is None:
+            return 404, 'not found'
+        try:
+            return 200, route( ** params )
+        except Exception as e:
+            return 500, 'closer control request failed: {!r}'.format( e )
+
+    def serve_forever( self ):
+        self._stopped.wait()
+
+    def stop( self ):
+        with self._lock:
+            self._stopping = True
+            if not self._inFlight:
+                self._stopped.set()
@@ -0,0 +1,140 @@
+import atexit
+import collections
+import logging
+import subprocess
+import threading
+from closer import channel
+from closer import remote
+
+SIZE = 4
+
+class Worker( object ):
+    def __init__( self, pool, command ):
+        self._pool = pool
+        self._remote = None
+        self.command = command
+        self.channel = channel.Channel( self )
+        self.process = subprocess.Popen( command, stdin = subprocess.PIPE, stdout = subprocess.PIPE, stderr = self.channel.stderr )
+        self.channel.start( remote.Remote.reactor )
+
+    @property
+    def alive( self ):
+        return self.process.poll() is None
+
+    def attach( self, remote_, stderr ):
+        self._remote = remote_
+        self.channel.redirect( stderr )
+        return self.channel
+
+    def close( self ):
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+
+    def _handshake( self, handshake ):
+        if self._remote is not None:
+            self._remote._handshake( handshake )
+
+    def _noHandshake( self ):
+        if self._remote is None:
+            self._pool._discard( self )
+            return
+        self._remote._noHandshake()
+
+    def _onControlReply( self, payload ):
+        if self._remote is not None:
+            self._remote._onControlReply( payload )
+
+    def _onOutcome( self, outcome ):
+        if self._remote is not None:
+            self._remote._onOutcome( outcome )
+
+    def _controlStreamClosed( self ):
+        if self._remote is not None:
+            self._remote._controlStreamClosed()
+
+class WarmPool( object ):
+    def __init__( self, size = SIZE ):
+        self._size = size
+        self._idle = collections.defaultdict( list )
+        self._lock = threading.Lock()
+        self._fillLocks = collections.defaultdict( threading.Lock )
+        self._pending = collections.OrderedDict()
+        self._wake = threading.Condition( self._lock )
+        self._refiller = None
+        self._closed = False
+        atexit.register( self.close )
+
+    @property
+    def size( self ):
+        return self._size
+
+    def idle( self, command ):
+        with self._lock:
+            return len( self._idle[ tuple( command ) ] )
+
+    def fill( self, command ):
+        key = tuple( command )
+        with self._lock:
+            fillLock = self._fillLocks[ key ]
+        with fillLock:
+            while True:
+                with self._lock:
+                    if self._closed or len( self._idle[ key ] ) >= self._size:
+                        return
+                worker = Worker( self, command )
+                with self._lock:
+                    self._idle[ key ].append( worker )
+
+    def acquire( self, command ):
+        key = tuple( command )
+        worker = None
+        with self._lock:
+            idle = self._idle[ key ]
+            while idle and worker is None:
+                candidate = idle.pop( 0 )
+                if candidate.alive:
+                    worker = candidate
+        self._refill( command )
+        return worker
+
+    def _refill( self, command ):
+        with self._lock:
+            if self._closed:
+                return
+            self._pending[ tuple( command ) ] = command
+            if self._refiller is None:
+                self._refiller = threading.Thread( target = self._refillLoop )
+                self._refiller.daemon = True
+                self._refiller.start()
+            self._wake.notify()
+
+    def _refillLoop( self ):
+        while True:
+            with self._lock:
+                while not self._pending and not self._closed:
+                    self._wake.wait()
+                if self._closed:
+                    return
+                _, command = self._pending.popitem( last = False )
+            try:
+                self.fill( command )
+            except Exception:
+                logging.exception( 'failed to refill warm workers for {}'.format( command ) )
+
+    def _discard( self, worker ):
+        with self._lock:
+            idle = self._idle[ tuple( worker.command ) ]
+            if worker in idle:
+                idle.remove( worker )
+
+    def close( self ):
+        with self._lock:
+            self._closed = True
+            self._pending.clear()
+            self._wake.notify_all()
+            workers = [ worker for idle in self._idle.values() for worker in idle ]
+            self._idle.clear()
+        for worker in workers:
+            worker.close()
@@ -0,0 +1,74 @@
+import os
+import subprocess
+import time
+import psutil
+import signal
+from closer import containment
+
+TREE = 'for i in 1 2 3 4 5; do ( sleep 1000; true ) & done; setsid sleep 1000 & wait'
+
+def alive( pid ):
+    try:
+        return psutil.Process( pid ).status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return False
+
+def spawnTree( tested ):
+    process = subprocess.Popen( [ 'bash', '-c', TREE ], stderr = subprocess.DEVNULL, ** tested.popenKwargs( {} ) )
+    tested.started( process.pid )
+    EXPECTED = 11
+    while len( psutil.Process( process.pid ).children( recursive = True ) ) < EXPECTED:
+        time.sleep( 0.01 )
+    return process, [ child.pid for child in psutil.Process( process.pid ).children( recursive = True ) ]
+
+class TestContainment( object ):
+    def test_child_leads_its_own_process_group( self ):
+        tested = containment.Containment()
+        process, tree = spawnTree( tested )
+        assert tested.processGroup == process.pid
+        assert os.getpgid( process.pid ) == process.pid
+        tested.kill( 'kill', root = process.pid )
+        process.wait()
+
+    def test_kill_reaches_whole_tree_including_escaped_sessions( self ):
+        tested = containment.Containment()
+        process, tree = spawnTree( tested )
+        escaped = [ pid for pid in tree if os.getpgid( pid ) != process.pid ]
+        assert len( escaped ) == 1
+        report = tested.kill( 'terminate', root = process.pid )
+        assert report[ 'survivors' ] == []
+        assert report[ 'elapsed' ] < 1
+        assert not any( alive( pid ) for pid in tree )
+        process.wait()
+
+    def test_escalates_to_sigkill_after_grace_period( self ):
+        tested = containment.Containment()
+        process = subprocess.Popen( [ 'bash', '-c', "trap '' TERM; sleep 1000 & wait; sleep 1000" ], ** tested.popenKwargs( {} ) )
+        tested.started( process.pid )
+        while not psutil.Process( process.pid ).children():
+            time.sleep( 0.01 )
+        GRACE = 0.5
+        report = tested.kill( 'terminate', root = process.pid, grace = GRACE )
+        assert report[ 'survivors' ] == []
+        assert GRACE <= report[ 'elapsed' ] < GRACE + 1
+        assert process.wait() == - signal.SIGKILL
+
+    def test_descendants_from_process_table( self ):
+        table = { 1: ( 0, 1 ), 10: ( 1, 10 ), 11: ( 10, 10 ), 12: ( 11, 12 ), 20: ( 1, 20 ) }
+        assert sorted( containment.descendants( 10, table ) ) == [ 11, 12 ]
+
+    def test_occupied_while_the_group_has_members( self ):
+        tested = containment.Containment()
+        process = subprocess.Popen( [ 'bash', '-c', 'sleep 1000 & echo started' ], stdout = subprocess.PIPE, ** tested.popenKwargs( {} ) )
+        tested.started( process.pid )
+        process.stdout.readline()
+        process.wait()
+        assert tested.occupied( process.pid )
+        tested.kill( 'kill' )
+        tested = containment.Containment()
+        process = subprocess.Popen( [ 'sleep', '1000' ], ** tested.popenKwargs( {} ) )
+        tested.started( process.pid )
+        assert tested.occupied( process.pid )
+        process.kill()
+        process.wait()
+        assert not tested.occupied( process.pid )
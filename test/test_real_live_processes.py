@@ -3,10 +3,19 @@ logging.basicConfig( level = logging.INFO )
 import pytest
 import time
 import closer.remote
+import closer.agent
+import closer.async_remote
+import closer.remote_group
+import closer.scheduler
+import closer.reactor
+import asyncio
 import closer.exceptions
 import concurrent.futures
 import subprocess
 import random
+import threading
+import json
+import sys
 
 IP = 'localhost'
 USER = 'me'
@@ -34,7 +43,7 @@ class TestRealLiveProcesses( object ):
     def dockerContainer( self ):
         docker = subprocess.run( [ 'docker', 'run', '-d', '--name', 'cont', '--network', 'host', 'haarcuba/for_closer', str( TEST_SSH_PORT ) ], stdout = subprocess.PIPE, universal_newlines = True, check = True )
         container = docker.stdout.strip()
-        subprocess.run( [ 'docker', 'cp', 'source/closer/closer3.py', f'{container}:/usr/local/lib/python3.5/dist-packages/closer/closer3.py' ], check = True )
+        subprocess.run( [ 'docker', 'cp', 'source/closer/.', f'{container}:/usr/local/lib/python3.5/dist-packages/closer/' ], check = True )
         yield container
         subprocess.run( [ 'docker', 'rm', '-f', container ] )
 
@@ -74,13 +83,11 @@ class TestRealLiveProcesses( object ):
         self.augment( first, 'closer3' )
         self.augment( second, 'closer3' )
 
-        first.background()
-        CAPTURE_THE_PORT = 1
-        time.sleep( CAPTURE_THE_PORT )
-        second.background()
-
-        SLACK_FOR_FINDING_THE_SECOND_PROCESS_CONTROL_PORT = 2
-        time.sleep( SLACK_FOR_FINDING_THE_SECOND_PROCESS_CONTROL_PORT )
+        first.background().wait( timeout = 10 )
+        secondLaunch = second.background()
+        secondLaunch.wait( timeout = 10 )
+        assert secondLaunch.latency > 0
+        assert first.controlPort != second.controlPort
 
         assert self.processAlive( 'first' )
         assert self.processAlive( 'second' )
@@ -89,6 +96,19 @@ class TestRealLiveProcesses( object ):
         assert not self.processAlive( 'first' )
         assert not self.processAlive( 'second' )
 
+    def test_ready_is_unavailable_with_stderr_merged_into_stdout( self, dockerContainer ):
+        tag = str( random.random() )
+        tested = closer.remote.Remote( USER, IP, f"sleep 200; echo tag={tag}", shell = True )
+        self.augment( tested, 'closer3' )
+        tested.localProcessKwargs( stderr = subprocess.STDOUT, stdout = subprocess.DEVNULL )
+        launch = tested.background()
+        with pytest.raises( closer.exceptions.RemoteProcessException ):
+            launch.wait( timeout = 1 )
+        time.sleep( 3 )
+        assert self.processAlive( f'tag={tag}' )
+        tested.terminate()
+        assert not self.processAlive( f'tag={tag}' )
+
     def test_capture_output_and_also_return_code( self, dockerContainer, closerCommand ):
         tag = str( random.random() )
         tested = closer.remote.Remote( USER, IP, f"bash -c 'echo -n {tag}-{tag}-{tag} ; exit 88'", shell = True )
@@ -235,6 +255,353 @@ class TestRealLiveProcesses( object ):
         assert monitor.exitCode is None
         assert not monitor.deathNotification
 
+    @pytest.mark.parametrize( 'backend', [ 'stdlib', 'flask' ] )
+    def test_control_backends( self, dockerContainer, backend ):
+        tag = str( random.random() )
+        tested = closer.remote.Remote( USER, IP, f"bash -c 'sleep 100; echo tag={tag}'", shell = True )
+        self.augment( tested, 'closer3' )
+        tested.setControlBackend( backend )
+        tested.background().wait( timeout = 10 )
+        assert self.processAlive( f'tag={tag}' )
+        tested.terminate()
+        assert not self.processAlive( f'tag={tag}' )
+
+    def test_agent_hosts_many_processes( self, dockerContainer ):
+        agent = closer.agent.Agent( USER, IP )
+        self.augment( agent, 'closer3' )
+        agent.start( cleanup = True ).wait( timeout = 10 )
+        tag = str( random.random() )
+        remotes = [ closer.remote.Remote( USER, IP, f"bash -c 'sleep 100; echo tag={tag}_{i}'", shell = True ).useAgent( agent ) for i in range( 10 ) ]
+        for remote in remotes:
+            remote.background( cleanup = True )
+        assert self.processAlive( f'tag={tag}_3' )
+        status = agent.status()
+        assert set( status ) == set( remote.uuid for remote in remotes )
+        assert all( job[ 'returncode' ] is None for job in status.values() )
+        remotes[ 3 ].terminate()
+        assert not self.processAlive( f'tag={tag}_3' )
+        assert self.processAlive( f'tag={tag}_4' )
+        agent.terminate()
+        assert not self.processAlive( f'tag={tag}' )
+        assert not self.processAlive( 'closer3 --agent' )
+
+    def test_async_remote( self, dockerContainer ):
+        tag = str( random.random() )
+        async def scenario():
+            tested = closer.async_remote.AsyncRemote( USER, IP, f"bash -c 'echo -n {tag}; exit 5'", shell = True )
+            self.augment( tested, 'closer3' )
+            completed = await tested.run( stdout = subprocess.PIPE )
+            assert completed.stdout == tag
+            assert completed.returncode == 5
+
+            monitored = [ closer.async_remote.AsyncRemote( USER, IP, f"bash -c 'for i in 1 2 3 4 5 6 7 8 9 10; do echo {tag}_$i; sleep 1; done'", shell = True ) for _ in range( 3 ) ]
+            async def monitor( remote ):
+                self.augment( remote, 'closer3' )
+                output = []
+                async for line in remote.lines( cleanup = True ):
+                    output.append( line )
+                    if len( output ) == 2:
+                        await remote.terminate()
+                return output, remote.returncode
+
+            for output, returncode in await asyncio.gather( * [ monitor( remote ) for remote in monitored ] ):
+                assert output[ : 2 ] == [ f'{tag}_1', f'{tag}_2' ]
+                assert returncode != 0
+
+        asyncio.run( scenario() )
+        assert not self.processAlive( tag )
+
+    def test_tidy_up_kills_in_parallel_and_reports( self, dockerContainer ):
+        tag = str( random.random() )
+        remotes = [ closer.remote.Remote( USER, IP, f"bash -c 'sleep 100; echo tag={tag}'", shell = True ) for _ in range( 5 ) ]
+        for remote in remotes:
+            self.augment( remote, 'closer3' )
+            remote.background( cleanup = True ).wait( timeout = 10 )
+        unreachable = closer.remote.Remote( USER, IP, 'true' )
+        unreachable.controlPort = 1
+        closer.remote.Remote._cleanup.append( unreachable )
+        try:
+            report = closer.remote.Remote.tidyUp( timeout = 2, deadline = 10 )
+        finally:
+            closer.remote.Remote._cleanup.remove( unreachable )
+        assert set( remotes ) <= set( report.killed )
+        assert unreachable in report.failed
+        assert not self.processAlive( f'tag={tag}' )
+
+    def test_ssh_connections_are_multiplexed( self, dockerContainer ):
+        pool = closer.remote.Remote.sshPool
+        tested = closer.remote.Remote( USER, IP, "bash -c 'exit 0'", shell = True )
+        self.augment( tested, 'closer3' )
+        tested.warmUp()
+        assert pool.alive( USER, IP, TEST_SSH_PORT, 'StrictHostKeyChecking=no' )
+        assert not pool.alive( USER, IP, TEST_SSH_PORT, 'StrictHostKeyChecking=yes' )
+        assert tested.foreground() == 0
+        assert pool.alive( USER, IP, TEST_SSH_PORT, 'StrictHostKeyChecking=no' )
+        pool.close( USER, IP, TEST_SSH_PORT )
+        assert not pool.alive( USER, IP, TEST_SSH_PORT, 'StrictHostKeyChecking=no' )
+
+    def test_many_live_monitors_share_one_reactor_thread( self, dockerContainer ):
+        threadsBefore = threading.active_count()
+        monitors = []
+        for index in range( 20 ):
+            tested = closer.remote.Remote( USER, IP, f"bash -c 'echo {index}_a; echo {index}_b; exit {index}'", shell = True )
+            self.augment( tested, 'closer3' )
+            monitor = Monitor()
+            tested.liveMonitor( onOutput = monitor.onOutput, onProcessEnd = monitor.onDeath, cleanup = True )
+            monitors.append( monitor )
+        assert threading.active_count() <= threadsBefore + 1 + closer.reactor.CALLBACK_WORKERS
+        SLACK = 10
+        time.sleep( SLACK )
+        for index, monitor in enumerate( monitors ):
+            assert monitor.output == [ f'{index}_a', f'{index}_b' ]
+            assert monitor.exitCode == index
+
+    def test_remote_group_runs_on_all_hosts( self, dockerContainer ):
+        hosts = [ IP, '127.0.0.1', IP, '127.0.0.1' ]
+        group = closer.remote_group.RemoteGroup( USER, hosts, "bash -c 'echo -n hello; exit 5'", shell = True ).setConcurrency( 2 )
+        group.configure( lambda remote: self.augment( remote, 'closer3' ) )
+        results = list( group.output( check = False ) )
+        assert sorted( result.host for result in results ) == sorted( hosts )
+        for result in results:
+            assert result.stdout == 'hello'
+            assert result.exitCode == 5
+            assert result.error is None
+            assert result.elapsed > 0
+        for result in group.output():
+            assert isinstance( result.error, closer.exceptions.RemoteProcessError )
+            assert result.exitCode == 5
+            assert not result.ok
+
+    def test_scheduler_respects_host_limit_and_cancels_queued_jobs( self, dockerContainer ):
+        scheduler = closer.scheduler.Scheduler( perHost = 2 )
+        jobs = []
+        for index in range( 5 ):
+            remote = closer.remote.Remote( USER, IP, f"bash -c 'sleep 2; exit {index}'", shell = True )
+            self.augment( remote, 'closer3' )
+            jobs.append( scheduler.submit( remote, priority = index, cleanup = True ) )
+        assert scheduler.running( IP ) == 2
+        assert scheduler.queued( IP ) == 3
+        cancelled = scheduler.cancel( jobs = jobs[ 2 : 3 ] )
+        assert cancelled == jobs[ 2 : 3 ]
+        scheduler.wait( timeout = 30 )
+        assert [ job.state for job in jobs ] == [ 'done', 'done', 'cancelled', 'done', 'done' ]
+        assert [ jobs[ index ].wait() for index in ( 0, 1, 3, 4 ) ] == [ 0, 1, 3, 4 ]
+
+    def test_launch_details_are_not_on_the_remote_command_line( self, dockerContainer ):
+        tag = str( random.random() )
+        environment = { f'BIG_{index}': 'x' * 10000 for index in range( 100 ) }
+        environment[ 'PATH' ] = '/usr/bin:/bin'
+        tested = closer.remote.Remote( USER, IP, f"echo ${{#BIG_7}}; sleep 100; echo tag={tag}", shell = True, env = environment )
+        self.augment( tested, 'closer3' )
+        tested.background().wait( timeout = 10 )
+        completedProcess = subprocess.run( f"ssh -p {TEST_SSH_PORT} -o StrictHostKeyChecking=no {USER}@{IP} pgrep -fa closer3", shell = True, stdout = subprocess.PIPE, universal_newlines = True )
+        assert '--details-on-stdin' in completedProcess.stdout
+        assert len( completedProcess.stdout ) < 1000
+        tested.terminate()
+
+    def test_foreground_reads_inherited_stdin( self, dockerContainer ):
+        script = f"""
+import closer.remote
+tested = closer.remote.Remote( '{USER}', '{IP}', 'read line; echo got=$line', shell = True )
+tested.setCloserCommand( 'closer3' )
+tested.sshPort = {TEST_SSH_PORT}
+tested.sshOptions( 'StrictHostKeyChecking=no' )
+tested.foreground()
+"""
+        completedProcess = subprocess.run( [ sys.executable, '-c', script ], input = 'hello\n', stdout = subprocess.PIPE, universal_newlines = True, timeout = 30 )
+        assert 'got=hello' in completedProcess.stdout
+
+    def test_terminate_escalates_and_confirms_death( self, dockerContainer ):
+        tag = str( random.random() )
+        tested = closer.remote.Remote( USER, IP, f"bash -c \"trap '' TERM; sleep 1000; echo tag={tag}\"", shell = True )
+        self.augment( tested, 'closer3' )
+        tested.setGracePeriod( 1 )
+        tested.background().wait( timeout = 10 )
+        report = tested.terminate()
+        assert report.confirmed
+        assert 1 <= report.elapsed < 3
+        assert not self.processAlive( f'tag={tag}', slack = 0 )
+
+    def test_terminate_kills_daemonized_grandchildren( self, dockerContainer ):
+        tag = str( random.random() )
+        tested = closer.remote.Remote( USER, IP, f"bash -c '( setsid bash -c \"sleep 1000; echo tag={tag}\" > /dev/null 2>&1 & ); sleep 1000'", shell = True )
+        self.augment( tested, 'closer3' )
+        tested.background().wait( timeout = 10 )
+        assert self.processAlive( f'tag={tag}' )
+        assert tested.terminate().confirmed
+        assert not self.processAlive( f'tag={tag}', slack = 0 )
+
+    def test_remote_process_dies_when_controller_is_killed( self, dockerContainer ):
+        tag = str( random.random() )
+        controllerScript = ( 'import closer.remote, time\n'
+                f'tested = closer.remote.Remote( "{USER}", "{IP}", "sleep 1000; echo tag={tag}", shell = True )\n'
+                'tested.setCloserCommand( "closer3" )\n'
+                f'tested.sshPort = {TEST_SSH_PORT}\n'
+                'tested.sshOptions( "StrictHostKeyChecking=no" )\n'
+                'tested.background( cleanup = True ).wait( timeout = 10 )\n'
+                'print( "launched", flush = True )\n'
+                'time.sleep( 1000 )\n' )
+        controller = subprocess.Popen( [ 'python', '-c', controllerScript ], stdout = subprocess.PIPE, universal_newlines = True )
+        assert controller.stdout.readline().strip() == 'launched'
+        assert self.processAlive( f'tag={tag}' )
+        controller.kill()
+        controller.wait()
+        assert not self.processAlive( f'tag={tag}', slack = 3 )
+
+    def test_remote_deadline_kills_background_process( self, dockerContainer ):
+        tag = str( random.random() )
+        tested = closer.remote.Remote( USER, IP, f"sleep 1000; echo tag={tag}", shell = True )
+        self.augment( tested, 'closer3' )
+        tested.background( timeout = 2 ).wait( timeout = 10 )
+        assert self.processAlive( f'tag={tag}' )
+        assert tested.process.wait( timeout = 10 ) != 0
+        assert tested.timedOut
+        assert not self.processAlive( f'tag={tag}', slack = 0 )
+
+    def test_exit_code_124_is_not_a_deadline( self, dockerContainer ):
+        tested = closer.remote.Remote( USER, IP, "exit 124", shell = True )
+        self.augment( tested, 'closer3' )
+        assert tested.run( timeout = 30 ).returncode == 124
+        assert not tested.timedOut
+
+    def test_control_over_the_ssh_session( self, dockerContainer ):
+        tag = str( random.random() )
+        tested = closer.remote.Remote( USER, IP, f"sleep 1000; echo tag={tag}", shell = True )
+        self.augment( tested, 'closer3' )
+        tested.setControlBackend( 'ssh' )
+        tested.background().wait( timeout = 10 )
+        assert tested.controlPort is None
+        assert tested.ping()
+        assert tested.status()[ 'returncode' ] is None
+        assert tested.terminate().confirmed
+        assert not self.processAlive( f'tag={tag}', slack = 0 )
+
+    def test_run_on_warm_workers( self, dockerContainer ):
+        import closer.warm_pool
+        closer.remote.Remote.warmPool = closer.warm_pool.WarmPool( size = 2 )
+        try:
+            tested = closer.remote.Remote( USER, IP, "bash -c 'echo -n out; echo -n err >&2; exit 5'", shell = True )
+            self.augment( tested, 'closer3' )
+            tested.warmUp()
+            assert closer.remote.Remote.warmPool.idle( tested._warmCommand() ) == 2
+            time.sleep( 2 )
+            completedProcess = tested.run( stdout = subprocess.PIPE, stderr = subprocess.PIPE )
+            assert ( completedProcess.returncode, completedProcess.stdout, completedProcess.stderr ) == ( 5, 'out', 'err' )
+            assert '--killer' not in completedProcess.args
+        finally:
+            closer.remote.Remote.warmPool.close()
+            closer.remote.Remote.warmPool = None
+
+    def test_remote_session_runs_commands_back_to_back( self, dockerContainer ):
+        import closer.remote_session
+        session = closer.remote_session.RemoteSession( USER, IP )
+        self.augment( session, 'closer3' )
+        session.start()
+        results = list( session.runMany( [ f'echo {index}; echo err{index} >&2; exit {index}' for index in range( 20 ) ], shell = True ) )
+        assert [ ( result.returncode, result.stdout, result.stderr ) for result in results ] == [ ( index, f'{index}\n', f'err{index}\n' ) for index in range( 20 ) ]
+        with pytest.raises( closer.exceptions.RemoteProcessTimeout ):
+            session.run( 'sleep 100', shell = True, timeout = 1 )
+        assert session.run( 'exit 124', shell = True, timeout = 30 ).returncode == 124
+        session.close()
+        assert session.process.returncode == 0
+
+    def test_detached_job_outlives_its_session_and_reattaches_at_an_offset( self, dockerContainer ):
+        tested = closer.remote.Remote( USER, IP, "for i in 1 2 3 4; do echo line$i; sleep 1; done; exit 7", shell = True )
+        self.augment( tested, 'closer3' )
+        job = tested.detach()
+        first = closer.remote.Remote( USER, IP )
+        self.augment( first, 'closer3' )
+        first.uuid = job
+        monitor = Monitor()
+        first.reattach( monitor.onOutput ).wait( timeout = 10 )
+        time.sleep( 2.5 )
+        first.process.kill()
+        seen = list( monitor.output )
+        assert seen[ : 2 ] == [ 'line1', 'line2' ]
+        second = closer.remote.Remote( USER, IP )
+        self.augment( second, 'closer3' )
+        second.uuid = job
+        monitor = Monitor()
+        second.reattach( monitor.onOutput, monitor.onDeath, offset = first.offset, discard = True )
+        time.sleep( 4 )
+        assert seen + monitor.output == [ 'line1', 'line2', 'line3', 'line4' ]
+        assert monitor.exitCode == 7
+
+    def test_list_and_kill_jobs_by_tag( self, dockerContainer ):
+        tag = str( random.random() )
+        for index in range( 3 ):
+            tested = closer.remote.Remote( USER, IP, f"sleep 1000; echo tag={tag}", shell = True ).setTag( tag )
+            self.augment( tested, 'closer3' )
+            tested.background().wait( timeout = 10 )
+        host = closer.remote.Remote( USER, IP )
+        self.augment( host, 'closer3' )
+        assert len( host.listJobs( tag = tag ) ) == 3
+        report = host.killJobs( tag = tag )
+        assert len( report.killed ) == 3 and report.confirmed
+        assert host.listJobs( tag = tag ) == []
+        assert not self.processAlive( f'tag={tag}', slack = 0 )
+
+    def test_reap_orphans_from_the_journal( self, dockerContainer, tmp_path ):
+        import closer.journal
+        tag = str( random.random() )
+        path = str( tmp_path / 'journal' )
+        closer.remote.Remote.journal = closer.journal.Journal( path )
+        try:
+            for index in range( 2 ):
+                tested = closer.remote.Remote( USER, IP, f"sleep 1000; echo tag={tag}", shell = True )
+                self.augment( tested, 'closer3' )
+                tested.background().wait( timeout = 10 )
+        finally:
+            closer.remote.Remote.journal = None
+        assert self.processAlive( f'tag={tag}' )
+        report = closer.remote.Remote.reap( path )
+        assert len( report.killed ) == 2 and not report.failed and not report.timedOut
+        assert not self.processAlive( f'tag={tag}', slack = 0 )
+        assert closer.journal.Journal( path ).orphans() == []
+
+    def test_journal_records_each_job_once_and_its_end( self, dockerContainer, tmp_path ):
+        import closer.journal
+        path = str( tmp_path / 'journal' )
+        closer.remote.Remote.journal = closer.journal.Journal( path )
+        try:
+            background = closer.remote.Remote( USER, IP, "sleep 1", shell = True )
+            self.augment( background, 'closer3' )
+            background.background().wait( timeout = 10 )
+            background.process.wait( timeout = 10 )
+            ran = closer.remote.Remote( USER, IP, "true", shell = True )
+            self.augment( ran, 'closer3' )
+            ran.run()
+        finally:
+            closer.remote.Remote.journal = None
+        start = time.time()
+        while closer.journal.Journal( path ).orphans() and time.time() - start < 3:
+            time.sleep( 0.1 )
+        with open( path ) as file:
+            events = sorted( ( entry[ 'uuid' ], entry[ 'event' ] ) for entry in map( json.loads, file ) )
+        assert events == sorted( [ ( background.uuid, 'launched' ), ( background.uuid, 'ended' ), ( ran.uuid, 'launched' ), ( ran.uuid, 'ended' ) ] )
+
+    @pytest.mark.parametrize( 'backend', [ 'stdlib', 'ssh' ] )
+    def test_terminate_from_live_monitor_callbacks( self, dockerContainer, backend ):
+        tag = str( random.random() )
+        tested = closer.remote.Remote( USER, IP, f"for i in $(seq 100); do echo $i; sleep 0.2; done; echo tag={tag}", shell = True )
+        self.augment( tested, 'closer3' )
+        tested.setControlBackend( backend )
+        reports = []
+        ended = threading.Event()
+
+        def onOutput( line ):
+            if line == '2':
+                reports.append( tested.terminate() )
+
+        def onProcessEnd( exitCode ):
+            reports.append( tested.terminate() )
+            ended.set()
+
+        tested.liveMonitor( onOutput = onOutput, onProcessEnd = onProcessEnd, cleanup = True )
+        assert ended.wait( timeout = 10 )
+        assert len( reports ) == 2 and reports[ 0 ].confirmed and reports[ 1 ] is reports[ 0 ]
+        assert not self.processAlive( f'tag={tag}', slack = 0 )
+
     def processAlive( self, searchString, slack = 1 ):
         time.sleep( slack )
         searchString = str( searchString )
@@ -0,0 +1,53 @@
+import codecs
+import os
+import pickle
+import subprocess
+import sys
+
+SOURCE = os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), '..', 'source' )
+STARTUP_BUDGET_MICROSECONDS = 60000
+DEFERRED_MODULES = [ 'flask', 'werkzeug', 'psutil', 'pprint', 'logging', 'http.server', 'requests' ]
+ATTEMPTS = 3
+
+def importTimes( statement ):
+    environment = dict( os.environ, PYTHONPATH = SOURCE )
+    completed = subprocess.run( [ sys.executable, '-X', 'importtime', '-c', statement ], stderr = subprocess.PIPE, universal_newlines = True, env = environment, check = True )
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith( 'import time:' ):
+            continue
+        _, cumulative, name = line.split( '|' )
+        if not cumulative.strip().isdigit():
+            continue
+        if name.startswith( '  ' ):
+            times.setdefault( name.strip(), 0 )
+        else:
+            times[ name.strip() ] = int( cumulative )
+    return times
+
+def launchStatement():
+    details = dict( popenDetails = dict( args = ( [ 'true' ], ), kwargs = {} ), port = 0, uuid = 'startup-test' )
+    hexed = codecs.encode( pickle.dumps( details, protocol = 2 ), 'hex' ).decode()
+    return "import sys\nsys.argv = [ 'closer3', '--quit-when-told', '{}' ]\nfrom closer import closer3\ntry:\n    closer3.main()\nexcept SystemExit:\n    pass\n".format( hexed )
+
+class TestStartupTime( object ):
+    def test_import_defers_heavy_modules( self ):
+        times = importTimes( 'import closer.closer3' )
+        assert 'closer.closer3' in times
+        for module in DEFERRED_MODULES + [ 'argparse', 'pickle', 'closer.control_server' ]:
+            assert module not in times
+
+    def test_quit_when_told_launch_defers_heavy_modules( self ):
+        times = importTimes( launchStatement() )
+        assert 'closer.control_server' in times
+        for module in DEFERRED_MODULES:
+            assert module not in times
+
+    def test_quit_when_told_launch_within_startup_budget( self ):
+        interpreter = set( importTimes( 'pass' ) )
+        def launchCost():
+            times = importTimes( launchStatement() )
+            return sum( cumulative for module, cumulative in times.items() if module not in interpreter )
+
+        best = min( launchCost() for _ in range( ATTEMPTS ) )
+        assert best < STARTUP_BUDGET_MICROSECONDS